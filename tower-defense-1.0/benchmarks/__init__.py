@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the Tower Defense Game. Run them from the project
+root, e.g. `python -m benchmarks.pathfinding --help`.
+"""
+import os
+
+# pygame greets you on stdout when it is imported, which would end up
+# in the JSON results when they are written to stdout.
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of sprite animation.
+
+Creates a crowd of enemies that walk back and forth -- flipping
+around every so often -- while they cycle through their walking
+animation, and times how long updating all of them takes per frame.
+No game is started and nothing is drawn, so the timings are of the
+sprites alone.
+
+The results are written out as JSON by `benchmarks.results`; a human
+readable summary is echoed to stderr as it goes.
+Run with:
+
+    python -m benchmarks.animation --enemies 1000 -o results.json
+"""
+import os
+import time
+from itertools import chain, repeat
+
+import click
+import pygame as pg
+
+from benchmarks.results import output_option, write_results
+from tower.cache import CACHE, IMAGE_SPRITES
+from tower.constants import SPRITES
+from tower.loader import import_images
+from tower.sprites import ENEMY_ANIMATIONS, TIMELINE, AnimationState, Enemy
+
+
+def init_display():
+    """
+    Opens a (dummy, unless one is configured) display, so the images
+    can be converted, and loads them into `IMAGE_SPRITES`.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pg.display.init()
+    pg.display.set_mode((1, 1))
+    images = import_images(SPRITES.values())
+    for sprite_index, sprite_name in SPRITES.items():
+        IMAGE_SPRITES[(False, False, sprite_index)] = images[sprite_name]
+
+
+def make_walk(offset, stride):
+    """
+    Walks back and forth along a line forever, turning around
+    every `stride` steps. `offset` staggers where along the walk
+    the enemy starts.
+    """
+    steps = chain(
+        ((x, False) for x in range(stride)),
+        ((stride - x, True) for x in range(stride)),
+    )
+    for x, flipx in chain.from_iterable(repeat(list(steps))):
+        yield (offset + x, offset), 0, flipx
+
+
+def create_enemies(count, groups, stride):
+    """
+    Creates `count` walking enemies the way the game does, minus the
+    sounds.
+    """
+    return [
+        Enemy.create_from_sprite(
+            index="enemy_1_walk_001",
+            animation_state=AnimationState.walking,
+            frames=ENEMY_ANIMATIONS,
+            path=make_walk(n % stride, stride),
+            groups=groups,
+        )
+        for n in range(count)
+    ]
+
+
+@click.command()
+@click.option(
+    "--enemies", default=1000, show_default=True, help="Number of enemies to animate."
+)
+@click.option(
+    "--frames", default=300, show_default=True, help="Number of frames to time."
+)
+@click.option(
+    "--stride",
+    default=60,
+    show_default=True,
+    help="Steps an enemy walks before it turns around.",
+)
+@output_option
+def main(enemies, frames, stride, output):
+    """
+    Times animating a crowd of walking enemies.
+    """
+    init_display()
+    group = pg.sprite.Group()
+    create_enemies(enemies, [group], stride)
+    # Warm up the rotation cache, so every frame is timed the same.
+    for _ in range(2 * stride):
+        TIMELINE.advance()
+        group.update()
+    timings = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        TIMELINE.advance()
+        group.update()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    result = {
+        "enemies": enemies,
+        "frames": frames,
+        "stride": stride,
+        "mean": sum(timings) / frames,
+        "median": timings[frames // 2],
+        "best": timings[0],
+        "worst": timings[-1],
+    }
+    click.echo(
+        f"{enemies} enemies: {result['mean'] * 1000:.3f}ms/frame mean, "
+        f"{result['median'] * 1000:.3f}ms median, {result['best'] * 1000:.3f}ms best",
+        err=True,
+    )
+    write_results(output, [result], rotation_cache=CACHE.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Generates synthetic levels for the benchmarks.
+
+Levels are generated in the same `{"index", "orientation"}` tile map
+format used by the level save files, and can be turned into a tile
+map the path finding understands with `load_tile_map`.
+"""
+import random
+from dataclasses import dataclass
+
+import pygame as pg
+
+from tower.constants import START_TILE_ID, STOP_TILE_ID
+from tower.helpers import get_grid_rect
+
+
+@dataclass
+class Tile:
+    """
+    Lightweight stand-in for the `Background` sprites of a loaded
+    level. The path finding only needs a tile's `index` and `rect`, and
+    creating hundreds of thousands of real sprites would dwarf the
+    timings we are interested in.
+    """
+
+    index: str
+    orientation: int
+    rect: pg.Rect
+
+
+def create_raw_tile_map(width, height, index="blank"):
+    """
+    Creates a `width` by `height` raw tile map filled with `index`.
+    """
+    return [
+        [{"index": index, "orientation": 0} for _ in range(width)]
+        for _ in range(height)
+    ]
+
+
+def make_maze(width, height, seed=None):
+    """
+    Generates a `width` by `height` maze of road tiles using a
+    randomized Depth-First Search, with a spawn tile in the top-left
+    corner and an escape tile at the far end of the longest path.
+
+    Mazes are the worst case for the path finding: every path is long
+    and winding, and there are plenty of dead ends to backtrack out of.
+    """
+    rng = random.Random(seed)
+    raw_tile_map = create_raw_tile_map(width, height)
+    # Cells sit on even grid positions; the odd positions between
+    # them are the walls we knock down to connect two cells.
+    cells_x, cells_y = (width + 1) // 2, (height + 1) // 2
+    visited = {(0, 0)}
+    stack = [(0, 0)]
+    # In a perfect maze the deepest cell of the search is also the one
+    # with the longest path back to the start.
+    deepest_cell, deepest = (0, 0), 1
+    raw_tile_map[0][0]["index"] = "road"
+    while stack:
+        cx, cy = stack[-1]
+        neighbours = [
+            (nx, ny)
+            for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1))
+            if 0 <= nx < cells_x and 0 <= ny < cells_y and (nx, ny) not in visited
+        ]
+        if not neighbours:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(neighbours)
+        visited.add((nx, ny))
+        stack.append((nx, ny))
+        raw_tile_map[cy + ny][cx + nx]["index"] = "road"
+        raw_tile_map[ny * 2][nx * 2]["index"] = "road"
+        if len(stack) > deepest:
+            deepest_cell, deepest = (nx, ny), len(stack)
+    raw_tile_map[0][0]["index"] = START_TILE_ID
+    dx, dy = deepest_cell
+    raw_tile_map[dy * 2][dx * 2]["index"] = STOP_TILE_ID
+    return raw_tile_map
+
+
+def make_open_field(width, height, seed=None):
+    """
+    Generates a `width` by `height` field made entirely of road
+    tiles, with a spawn tile in the middle of the left edge and an
+    escape tile in the middle of the right edge.
+
+    Open fields are the worst case for `dfs_find_path`, which wanders
+    all over the field before it stumbles on the escape tile.
+    """
+    raw_tile_map = create_raw_tile_map(width, height, index="road")
+    raw_tile_map[height // 2][0]["index"] = START_TILE_ID
+    raw_tile_map[height // 2][width - 1]["index"] = STOP_TILE_ID
+    return raw_tile_map
+
+
+def make_islands(width, height, seed=None, islands=4):
+    """
+    Generates a `width` by `height` level of `islands` mazes side by
+    side, each with its own spawn and escape tile and separated from
+    the next by a column of blank tiles.
+
+    Enemies can only ever reach the escape tile on the island they
+    spawned on, which is what the path finding has to figure out.
+    """
+    raw_tile_map = create_raw_tile_map(width, height)
+    island_width = (width - (islands - 1)) // islands
+    if island_width < 1:
+        raise ValueError(f"A {width} wide level cannot fit {islands} islands")
+    for island in range(islands):
+        offset = island * (island_width + 1)
+        island_seed = None if seed is None else seed + island
+        maze = make_maze(island_width, height, seed=island_seed)
+        for row, maze_row in zip(raw_tile_map, maze):
+            row[offset : offset + island_width] = maze_row
+    return raw_tile_map
+
+
+def make_portals(width, height, seed=None, portals=None):
+    """
+    Generates a `width` by `height` maze with `portals` spawn tiles
+    and as many escape tiles scattered across it. It defaults to one
+    of each for every 8 tiles along the shortest side.
+
+    Every spawn tile can reach every escape tile, so the number of
+    start/stop pairs grows with the square of `portals`.
+    """
+    rng = random.Random(seed)
+    if portals is None:
+        portals = max(1, min(width, height) // 8)
+    raw_tile_map = make_maze(width, height, seed=seed)
+    roads = [
+        raw_tile
+        for row in raw_tile_map
+        for raw_tile in row
+        if raw_tile["index"] == "road"
+    ]
+    chosen = rng.sample(roads, min(len(roads), portals * 2))
+    for raw_tile in chosen[::2]:
+        raw_tile["index"] = START_TILE_ID
+    for raw_tile in chosen[1::2]:
+        raw_tile["index"] = STOP_TILE_ID
+    return raw_tile_map
+
+
+def load_tile_map(raw_tile_map):
+    """
+    Turns a `raw_tile_map` into a tile map of `Tile` objects.
+    """
+    return [
+        [
+            Tile(
+                index=raw_tile["index"],
+                orientation=raw_tile["orientation"],
+                rect=get_grid_rect(gx, gy),
+            )
+            for gx, raw_tile in enumerate(row)
+        ]
+        for gy, row in enumerate(raw_tile_map)
+    ]
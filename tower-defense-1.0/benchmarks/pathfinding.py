@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for `tower.pathfinding`.
+
+Generates synthetic levels -- mazes, open fields, islands of mazes and
+mazes with many spawn and escape tiles -- and times `get_portals`,
+`walk_grid`, `update_path_finding`, the `dfs_find_path` and
+`astar_find_path` routers and `make_enemy_path` on each of them
+separately.
+
+The results are written out as JSON by `benchmarks.results`; a human
+readable summary is echoed to stderr as it goes.
+Run with:
+
+    python -m benchmarks.pathfinding --size 512x512 --size 1000x1000 -o results.json
+"""
+import random
+import time
+
+import click
+
+from benchmarks.levels import (
+    load_tile_map,
+    make_islands,
+    make_maze,
+    make_open_field,
+    make_portals,
+)
+from benchmarks.results import output_option, write_results
+from tower.constants import MOVABLE_TILE_IDS, START_TILE_ID, STOP_TILE_ID
+from tower.pathfinding import (
+    astar_find_path,
+    dfs_find_path,
+    get_portals,
+    make_enemy_path,
+    update_path_finding,
+    walk_grid,
+)
+
+GENERATORS = {
+    "maze": make_maze,
+    "open": make_open_field,
+    "islands": make_islands,
+    "portals": make_portals,
+}
+
+
+def parse_size(ctx, param, value):
+    """
+    Parses a list of `WIDTHxHEIGHT` strings into tuples of integers.
+    """
+    try:
+        return [tuple(int(n) for n in size.lower().split("x")) for size in value]
+    except ValueError:
+        raise click.BadParameter("sizes must be given as WIDTHxHEIGHT")
+
+
+def measure(fn, repeat, seed):
+    """
+    Calls `fn` `repeat` times and returns the result of the last
+    call along with the fastest call's time, in seconds.
+
+    The random number generator is reseeded with `seed` before every
+    call, so the randomized routers do the same work each time.
+    """
+    best = None
+    for _ in range(repeat):
+        random.seed(seed)
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
+
+
+def benchmark_level(tile_map, repeat, seed):
+    """
+    Times each path finding function on `tile_map`. Yields a tuple
+    of the function name, its time and the number of items -- tiles,
+    pairs or steps -- it produced.
+    """
+    (start_positions, stop_positions), seconds = measure(
+        lambda: get_portals(tile_map, START_TILE_ID, STOP_TILE_ID), repeat, seed
+    )
+    yield "get_portals", seconds, len(start_positions) + len(stop_positions)
+
+    visited = {}
+
+    def _walk_grid():
+        visited.clear()
+        return walk_grid(tile_map, visited, *min(start_positions), MOVABLE_TILE_IDS)
+
+    _, seconds = measure(_walk_grid, repeat, seed)
+    yield "walk_grid", seconds, len(visited)
+
+    paths, seconds = measure(lambda: update_path_finding(tile_map), repeat, seed)
+    yield "update_path_finding", seconds, len(paths)
+    if not paths:
+        return
+    start_tile, stop_tile = paths[0]
+    stop_positions = [stop_tile.position]
+    for router in (dfs_find_path, astar_find_path):
+        path, seconds = measure(
+            lambda: router(start_tile, stop_positions), repeat, seed
+        )
+        yield router.__name__, seconds, len(path)
+
+    steps, seconds = measure(
+        lambda: list(make_enemy_path(start_tile, stop_positions)), repeat, seed
+    )
+    yield "make_enemy_path", seconds, len(steps)
+
+
+@click.command()
+@click.option(
+    "--size",
+    "sizes",
+    multiple=True,
+    default=["24x16", "128x128", "512x512"],
+    show_default=True,
+    callback=parse_size,
+    help="Level size as WIDTHxHEIGHT, up to 1000x1000. May be given more than once.",
+)
+@click.option(
+    "--level",
+    "levels",
+    multiple=True,
+    type=click.Choice(list(GENERATORS)),
+    default=list(GENERATORS),
+    show_default=True,
+    help="Kind of level to generate. May be given more than once.",
+)
+@click.option("--seed", default=0, show_default=True, help="Level generator seed.")
+@click.option(
+    "--repeat",
+    default=3,
+    show_default=True,
+    help="Times to run each benchmark. The fastest run is reported.",
+)
+@output_option
+def main(sizes, levels, seed, repeat, output):
+    """
+    Times the path finding functions on randomly generated levels.
+    """
+    results = []
+    for level in levels:
+        for width, height in sizes:
+            tile_map = load_tile_map(GENERATORS[level](width, height, seed=seed))
+            for name, seconds, count in benchmark_level(tile_map, repeat, seed):
+                click.echo(
+                    f"{level} {width}x{height}: {name} {seconds:.4f}s ({count})",
+                    err=True,
+                )
+                results.append(
+                    {
+                        "level": level,
+                        "width": width,
+                        "height": height,
+                        "benchmark": name,
+                        "seconds": seconds,
+                        "count": count,
+                    }
+                )
+    write_results(output, results, seed=seed, repeat=repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Writes out benchmark results as JSON, along with the versions and
+platform they were measured on, so they can be compared across
+releases.
+"""
+import json
+import platform
+from datetime import datetime, timezone
+
+import click
+import pygame as pg
+
+import tower
+
+output_option = click.option(
+    "--output",
+    "-o",
+    type=click.File("w"),
+    default="-",
+    show_default=True,
+    help="File to write the JSON results to.",
+)
+
+
+def write_results(output, results, **params):
+    """
+    Writes `results`, a list of dicts, to the file `output` as JSON.
+    Any `params` the benchmark was run with are written out too.
+    """
+    json.dump(
+        {
+            "version": tower.VERSION,
+            "python": platform.python_version(),
+            "pygame": pg.version.ver,
+            "platform": platform.platform(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            **params,
+            "results": results,
+        },
+        output,
+        indent=2,
+    )
+    output.write("\n")
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Packs the sprite images into a few large sheets -- a texture atlas --
+so the game opens and decodes a handful of PNGs at startup instead of
+one per sprite.
+
+The atlas is described by a JSON manifest, `ATLAS_MANIFEST`, that
+lists the sheets and where in them each image was packed:
+
+    {
+        "sheets": ["atlas_0.png", ...],
+        "images": {"road.png": {"sheet": 0, "rect": [x, y, width, height]}, ...}
+    }
+
+Rebuild it with `tower build-atlas` whenever the images change.
+"""
+import json
+
+import pygame as pg
+from structlog import get_logger
+
+from tower.constants import (
+    ATLAS_MANIFEST,
+    ATLAS_MAX_SPRITE_SIZE,
+    ATLAS_SHEET_SIZE,
+    SPRITES,
+)
+from tower.loader import load
+
+log = get_logger()
+
+
+def pack(sizes, sheet_size=ATLAS_SHEET_SIZE):
+    """
+    Packs rectangles of `sizes`, a dict of name to (width, height),
+    into as few sheets of `sheet_size` as it can.
+
+    Uses a simple shelf packer: the tallest rectangles are placed
+    first, left to right, in rows as tall as the first rectangle in
+    them.
+
+    Returns a dict of name to (sheet, rect).
+    """
+    sheet_width, sheet_height = sheet_size
+    packed = {}
+    sheet, x, y, shelf_height = 0, 0, 0, 0
+    for name, (width, height) in sorted(
+        sizes.items(), key=lambda item: (-item[1][1], -item[1][0], item[0])
+    ):
+        if width > sheet_width or height > sheet_height:
+            raise ValueError(f"{name} ({width}x{height}) does not fit in a sheet")
+        if x + width > sheet_width:
+            # Start a new shelf...
+            x, y, shelf_height = 0, y + shelf_height, 0
+        if y + height > sheet_height:
+            # ... or, if there is no room for it, a new sheet.
+            sheet, x, y, shelf_height = sheet + 1, 0, 0, 0
+        packed[name] = (sheet, pg.Rect(x, y, width, height))
+        x += width
+        shelf_height = max(shelf_height, height)
+    return packed
+
+
+def build_atlas(
+    asset_names,
+    sheet_size=ATLAS_SHEET_SIZE,
+    max_sprite_size=ATLAS_MAX_SPRITE_SIZE,
+    manifest_name=ATLAS_MANIFEST,
+):
+    """
+    Packs the images named `asset_names` into sheets and writes
+    them, along with the manifest, next to the images.
+
+    Images with a side longer than `max_sprite_size`, like the
+    backdrop, are left out and loaded on their own.
+    """
+    images = {}
+    for asset_name in sorted(set(asset_names)):
+        with load("tower.assets.gfx", asset_name) as resource:
+            image = pg.image.load(resource)
+        if max(image.get_size()) > max_sprite_size:
+            log.debug("Not packing oversized image", asset_name=asset_name)
+            continue
+        images[asset_name] = image
+    packed = pack({name: image.get_size() for name, image in images.items()})
+    sheets = []
+    for asset_name, (sheet, rect) in packed.items():
+        while sheet >= len(sheets):
+            surface = pg.Surface(sheet_size, flags=pg.SRCALPHA)
+            surface.fill((0, 0, 0, 0))
+            sheets.append(surface)
+        sheets[sheet].blit(images[asset_name], rect)
+    manifest = {"sheets": [], "images": {}}
+    with load("tower.assets.gfx", manifest_name) as manifest_path:
+        for sheet, surface in enumerate(sheets):
+            sheet_name = f"{manifest_path.stem}_{sheet}.png"
+            pg.image.save(surface, str(manifest_path.with_name(sheet_name)))
+            manifest["sheets"].append(sheet_name)
+        for asset_name, (sheet, rect) in sorted(packed.items()):
+            manifest["images"][asset_name] = {"sheet": sheet, "rect": list(rect)}
+        with open(manifest_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+    log.info(
+        "Built texture atlas",
+        manifest=manifest_name,
+        sheets=len(sheets),
+        images=len(packed),
+    )
+    return manifest
+
+
+def build_sprite_atlas():
+    """
+    Packs every image in `SPRITES` into the texture atlas.
+    """
+    return build_atlas(SPRITES.values())
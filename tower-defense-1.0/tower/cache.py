@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import pygame as pg
+from pygame.math import Vector2 as Vector
+from structlog import get_logger
+
+from tower.constants import (
+    ROTATION_ANGLE_STEP,
+    ROTATION_CACHE_BYTES,
+    TEXT_CACHE_SIZE,
+)
+
+log = get_logger()
+
+
+class SpriteImages(dict):
+    """
+    Dict of sprite images, keyed by a tuple of (flipped_x, flipped_y,
+    sprite_name).
+
+    Only the unflipped images are stored up front. Flipped images are
+    made the first time they are looked up, and those that look the
+    same as the unflipped image -- like most background tiles -- are
+    not stored twice.
+    """
+
+    def __missing__(self, key):
+        flipped_x, flipped_y, sprite_name = key
+        if not (flipped_x or flipped_y):
+            raise KeyError(key)
+        image = self[(False, False, sprite_name)]
+        flipped_image = pg.transform.flip(image, flip_x=flipped_x, flip_y=flipped_y)
+        if pg.image.tobytes(flipped_image, "RGBA") == pg.image.tobytes(image, "RGBA"):
+            flipped_image = image
+        self[key] = flipped_image
+        return flipped_image
+
+
+class FlipOffsets(dict):
+    """
+    Dict of how far the centroid of a sprite image's mask moves when
+    the image is flipped horizontally, keyed by a tuple of
+    (flipped_x, sprite_name). The offset keyed by `flipped_x` is the
+    one to apply when the image is flipped to `flipped_x`.
+
+    The offsets of every animation frame are made when the images are
+    loaded, with `add`; any other is made the first time it is looked
+    up.
+    """
+
+    def __missing__(self, key):
+        _, sprite_name = key
+        self.add(sprite_name)
+        return self[key]
+
+    def add(self, *sprite_names):
+        """
+        Makes the offsets of `sprite_names`, unflipped and flipped.
+        """
+        for sprite_name in sprite_names:
+            image = IMAGE_SPRITES[(False, False, sprite_name)]
+            # N.B.: the flipped image is only needed for its mask, so
+            # it is not kept in `IMAGE_SPRITES`.
+            flipped_image = pg.transform.flip(image, flip_x=True, flip_y=False)
+            centroid = Vector(pg.mask.from_surface(image).centroid())
+            flipped_centroid = Vector(pg.mask.from_surface(flipped_image).centroid())
+            self[(True, sprite_name)] = flipped_centroid - centroid
+            self[(False, sprite_name)] = centroid - flipped_centroid
+
+
+@dataclass
+class LRUCache:
+    """
+    Base class for least-recently-used caches.
+
+    Every entry has a size, given by `get_size`: one, unless a
+    subclass says otherwise. Once the entries add up to more than
+    `max_size`, the least recently used ones are evicted.
+
+    `hits`, `misses`, `evictions` and `size` can be read at runtime
+    to see how well the cache is doing; see also `stats`.
+    """
+
+    max_size: int
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+    _entries: OrderedDict = field(init=False, repr=False, default_factory=OrderedDict)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_size(self, entry):
+        return 1
+
+    def get_or_create(self, key, factory, *args):
+        """
+        Returns the entry for `key`, calling `factory` with `args` to
+        create it on a miss.
+        """
+        try:
+            entry = self._entries[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+        entry = self._entries[key] = factory(*args)
+        self.size += self.get_size(entry)
+        # Never evict the entry we just added, even if it alone is
+        # bigger than the budget.
+        while self.size > self.max_size and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= self.get_size(evicted)
+            self.evictions += 1
+        return entry
+
+    def clear(self):
+        """
+        Removes every entry. The stats are kept.
+        """
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self):
+        """
+        Returns a dict of the cache's size and hit rate.
+        """
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+@dataclass
+class RotationCache(LRUCache):
+    """
+    Least-recently-used cache of rotated sprite images, keyed by a
+    sprite's `rotate_cache_key()` and the angle it is rotated by.
+
+    Angles are normalized to [0, 360) and rounded to the nearest
+    `angle_step` degrees, so a sprite that spins forever (or rotates
+    by arbitrary floating point angles) reuses a bounded number of
+    entries.
+
+    Every entry reports its size in bytes with an `nbytes`
+    attribute, so `max_size` and `size` are in bytes.
+    """
+
+    max_size: int = ROTATION_CACHE_BYTES
+    angle_step: float = ROTATION_ANGLE_STEP
+
+    def get_size(self, entry):
+        return entry.nbytes
+
+    def quantize(self, angle):
+        """
+        Normalizes `angle` to [0, 360) and rounds it to the nearest
+        `angle_step` degrees.
+        """
+        return round((angle % 360) / self.angle_step) * self.angle_step % 360
+
+    def get(self, key, angle, factory, *args):
+        """
+        Returns the entry for `key` rotated by `angle`, calling
+        `factory` with `args` and the quantized angle to create it on
+        a miss.
+        """
+        angle = self.quantize(angle)
+        return self.get_or_create((key, angle), factory, *args, angle)
+
+
+class FontPool(dict):
+    """
+    Dict of fonts, keyed by a tuple of (font_name, size). Each font
+    is loaded the first time it is looked up, and shared from then on.
+    """
+
+    def __missing__(self, key):
+        font_name, size = key
+        font = self[key] = pg.font.Font(font_name, size)
+        return font
+
+
+@dataclass
+class TextCache(LRUCache):
+    """
+    Least-recently-used cache of rendered strings, keyed by the font,
+    the text and its color, that holds up to `max_size` of them.
+
+    The rendered images are shared, so they must never be drawn upon.
+    """
+
+    max_size: int = TEXT_CACHE_SIZE
+
+    def render(self, font_name, size, text, color):
+        """
+        Returns `text` rendered, antialiased, in `color` with the
+        font `font_name` at `size` from `FONTS`.
+        """
+        return self.get_or_create(
+            (font_name, size, text, tuple(pg.Color(color))),
+            render_text,
+            font_name,
+            size,
+            text,
+            color,
+        )
+
+
+def render_text(font_name, size, text, color):
+    return FONTS[(font_name, size)].render(text, True, color)
+
+
+# Holds the converted and imported sprite images.
+IMAGE_SPRITES = SpriteImages()
+
+FLIP_OFFSETS = FlipOffsets()
+
+CACHE = RotationCache()
+
+FONTS = FontPool()
+
+TEXT_CACHE = TextCache()
+
+# The loaded sound effects, keyed by their names in `SOUNDS`. Empty
+# when there is no sound mixer.
+SOUND_EFFECTS = {}
+
+# Rotated turret visions, keyed by the size of the vision and the
+# angle of the sweep. There are only ever a few hundred of them, as
+# `create_turret_sweep` only ever sweeps through whole degrees.
+VISION_SWEEPS = {}
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-from typing import Dict, Tuple
 from itertools import chain
 import glob
 import pygame as pg
@@ -77,9 +76,19 @@ for animation in chain.from_iterable(ANIMATIONS.values()):
 
 # Load in the animations into the SPRITES dict.
 
+# Manifest of the texture atlas that `SPRITES` are packed into; see
+# `tower.atlas`. Sprites are packed into sheets of `ATLAS_SHEET_SIZE`,
+# unless either side is bigger than `ATLAS_MAX_SPRITE_SIZE`.
+ATLAS_MANIFEST = "atlas.json"
+ATLAS_SHEET_SIZE = (1024, 1024)
+ATLAS_MAX_SPRITE_SIZE = 256
+
 # None means use pygame's default
 FONT_NAME = None
 FONT_SIZE = 20
+# Number of rendered strings kept around, so text that is shown again
+# (menu items, HUD stats) is not rendered again.
+TEXT_CACHE_SIZE = 256
 
 
 # Turret vision rectangle. Note that if you change the dimensions you
@@ -133,6 +142,21 @@ MOVABLE_TILE_IDS = {"road"}
 START_TILE_ID = "road_spawn"
 # Tile ID where enemies stop (and thus "escape")
 STOP_TILE_ID = "road_escape"
+# Number of distinct, randomized routes to precompute between every
+# pair of start and stop tiles.
+PATH_POOL_SIZE = 8
+# Cost of stepping onto a tile, by tile ID, when enemies take the
+# shortest path. Tiles that are not listed cost `DEFAULT_TILE_COST`.
+DEFAULT_TILE_COST = 1
+TILE_COSTS = {
+    "road": 1,
+    "road_spawn": 1,
+    "road_escape": 1,
+}
+# Extra cost of stepping onto a tile within `TURRET_COST_RADIUS` tiles
+# of a turret when enemies take the shortest path.
+TURRET_TILE_COST = 4
+TURRET_COST_RADIUS = 3
 
 # Tile width and height. This _must_ match the dimensions of the
 # images or you'll wind up with black borders!
@@ -163,11 +187,17 @@ KEY_SHRUB = 2
 KEY_ENEMY = 4
 
 
-# Holds the converted and imported sprite images. The key is a tuple
-# of (flipped_x, flipped_y, sprite_name)
-IMAGE_SPRITES: Dict[Tuple[bool, bool, str], pg.Surface] = {}
-
 # List of colors to draw the debug paths with
 PATH_COLORS = ["turquoise1", "blue1", "firebrick1", "gold1"]
 
-CACHE = {}
+# Memory budget, in bytes, of the cache of rotated sprite images, and
+# the step, in degrees, that rotation angles are rounded to in it.
+ROTATION_CACHE_BYTES = 64 * 1024 * 1024
+ROTATION_ANGLE_STEP = 1
+
+# Version of the on-disk cache of decoded images and sounds. Bump it
+# whenever the format of the cached files changes. The cache lives in
+# `ASSET_CACHE_ENV`, if it is set, and in the user's cache directory
+# otherwise; set it to an empty string to disable the cache.
+ASSET_CACHE_VERSION = 1
+ASSET_CACHE_ENV = "TOWER_ASSET_CACHE"
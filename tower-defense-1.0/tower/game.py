@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
 import enum
 import json
+import os
 import random
-import tkinter
-import tkinter.filedialog
+import time
 from contextlib import contextmanager
 from dataclasses import dataclass, field
+from functools import lru_cache
 from itertools import chain, repeat, tee
 from typing import Generator, Optional, List
 
@@ -14,8 +15,8 @@ from structlog import get_logger
 from pygame.math import Vector2 as Vector
 
 from tower.constants import (
+    ANIMATIONS,
     DESIRED_FPS,
-    IMAGE_SPRITES,
     PATH_COLORS,
     INTENSITY_FREQUENCY,
     KEY_BACKGROUND,
@@ -31,6 +32,13 @@ from tower.constants import (
     TILES_X,
     TILES_Y,
 )
+from tower.cache import (
+    CACHE,
+    FLIP_OFFSETS,
+    IMAGE_SPRITES,
+    SOUND_EFFECTS,
+    TEXT_CACHE,
+)
 from tower.helpers import (
     create_surface,
     lerp,
@@ -41,8 +49,15 @@ from tower.helpers import (
     get_grid_rect,
     pairwise,
 )
-from tower.loader import import_image, import_sound, import_level
-from tower.pathfinding import make_enemy_path, update_path_finding, get_directions
+from tower.loader import import_assets, import_level
+from tower.pathfinding import (
+    Navigation,
+    PathCache,
+    get_route_directions,
+    get_turret_costs,
+    make_flow_field_path,
+    make_jitter,
+)
 from tower.sprites import (
     AnimationState,
     Background,
@@ -50,15 +65,12 @@ from tower.sprites import (
     Layer,
     SpriteManager,
     SpriteState,
+    StaticLayer,
+    TIMELINE,
     Text,
     Sprite,
 )
 
-# Required to hide the default TKinter window that appears, and to
-# initialize Tkinter so we can use the open and save dialogs
-root = tkinter.Tk()
-root.withdraw()
-
 log = get_logger()
 
 
@@ -79,10 +91,14 @@ class GameMode:
 
     The `killed` and `escaped` values are updated by the game engine
     whenever an enemy is killed or escapes.
+
+    The `navigation` value determines how spawned enemies find their
+    way from a start tile to a stop tile.
     """
 
     killed: int
     escaped: int
+    navigation: Navigation
 
     def reset(self) -> None:
         """
@@ -150,10 +166,11 @@ class GameModeElimination(GameMode):
     intensity_frequency: int
 
     @classmethod
-    def create(cls):
+    def create(cls, navigation=Navigation.path):
         o = cls(
             killed=0,
             escaped=0,
+            navigation=navigation,
             intensity=1,
             max_defenses=1,
             max_escaped=MAX_ESCAPED,
@@ -255,6 +272,40 @@ def create_background_tile_map(raw_tile_map):
     return background_tiles
 
 
+def draw_changed_sprites(sprites, surface, background, drawn):
+    """
+    Draws only the parts of `surface` where `sprites` changed since
+    the last call, and returns the list of rects that changed.
+
+    `drawn` maps every sprite to the image and rect it was last drawn
+    with, and is updated in place. A sprite has changed if either is
+    different, or if it was removed. The rects it was drawn at before
+    and after are repainted from `background`, along with every sprite
+    that overlaps them, in order.
+    """
+    dirty = []
+    for sprite in sprites:
+        last_drawn = drawn.pop(sprite, None)
+        if last_drawn is not None:
+            image, rect = last_drawn
+            if image is sprite.image and rect == sprite.rect:
+                continue
+            dirty.append(rect)
+        dirty.append(sprite.rect.copy())
+    # Whatever is left was removed since the last call.
+    dirty.extend(rect for _, rect in drawn.values())
+    drawn.clear()
+    sprite_rects = [sprite.rect for sprite in sprites]
+    for rect in dirty:
+        surface.set_clip(rect)
+        surface.blit(background, rect, rect)
+        for index in rect.collidelistall(sprite_rects):
+            surface.blit(sprites[index].image, sprites[index].rect)
+    surface.set_clip(None)
+    drawn.update((sprite, (sprite.image, sprite.rect.copy())) for sprite in sprites)
+    return dirty
+
+
 def collide_mask(group_a, group_b):
     """
     Uses the sprite mask attribute to check if two groups of sprites are colliding.
@@ -321,6 +372,15 @@ class TowerGame:
 
     The `state` variable is the current game state.
 
+    The `navigation` variable is passed on to the game mode and
+    determines how enemies navigate the map.
+
+    The `dirty_rects` variable determines if the map editor and game
+    play loops repaint only the parts of the screen that changed.
+
+    The `headless` variable runs the game without a display or sound,
+    drawing nothing and as fast as it can; see `simulate`.
+
     Each of `game_edit`, `game_play`, `game_menu`, and `game_ended`
     represent each unique game loop (and requisite `state`) the game
     engine must loop.
@@ -331,13 +391,24 @@ class TowerGame:
     channels: dict
     fullscreen: bool
     state: GameState
+    navigation: Navigation
+    dirty_rects: bool
+    headless: bool
     game_edit: "GameLoop" = field(init=False, default=None)
     game_play: "GameLoop" = field(init=False, default=None)
     game_menu: "GameLoop" = field(init=False, default=None)
     game_ended: "GameLoop" = field(init=False, default=None)
+    # When `init` started, until the first frame is shown.
+    _started_at: Optional[float] = field(init=False, default=None, repr=False)
 
     @classmethod
-    def create(cls, fullscreen=False):
+    def create(
+        cls,
+        fullscreen=False,
+        navigation=Navigation.path,
+        dirty_rects=False,
+        headless=False,
+    ):
         """
         Creates a TowerGame instance with sensible defaults.
         """
@@ -352,6 +423,9 @@ class TowerGame:
             screen=None,
             channels=channels,
             fullscreen=fullscreen,
+            navigation=navigation,
+            dirty_rects=dirty_rects,
+            headless=headless,
             # We define our screen rectable to be proportional to the
             # number of tiles and the defined height and width of the
             # tiles we are using.
@@ -360,6 +434,37 @@ class TowerGame:
         game.init()
         return game
 
+    def draw_loading_screen(self, done, total):
+        """
+        Draws a progress bar showing that `done` out of `total`
+        assets are loaded.
+        """
+        bar = pg.Rect(0, 0, self.screen_rect.width // 2, 20)
+        bar.center = self.screen_rect.center
+        self.screen.fill("black")
+        pg.draw.rect(self.screen, "white", bar, width=1)
+        pg.draw.rect(
+            self.screen,
+            "white",
+            (*bar.topleft, round(bar.width * done / max(total, 1)), bar.height),
+        )
+        pg.display.flip()
+        # Keep the window responsive while loading.
+        pg.event.pump()
+
+    def log_first_frame(self):
+        """
+        Logs, once, how long it took from `init` until the first
+        frame was shown.
+        """
+        if self._started_at is None:
+            return
+        log.info(
+            "Time to first frame",
+            seconds=round(time.perf_counter() - self._started_at, 3),
+        )
+        self._started_at = None
+
     def set_state(self, next_state: GameState):
         """
         Transitions the game state from one state to another.
@@ -412,6 +517,31 @@ class TowerGame:
         self.set_state(GameState.main_menu)
         self.loop()
 
+    def simulate(self, level_file, turrets=(), max_frames=None):
+        """
+        Plays the level in `level_file`, skipping the menus, with
+        `turrets` -- pairs of position and orientation -- placed
+        before the first enemy spawns, until the game is won or lost
+        or `max_frames` frames have been played.
+
+        Like `start_game`, this is only meant to be called once, and
+        only after the game is initialized. It is intended for
+        headless games.
+
+        Returns the game mode, with the final tally, and the number of
+        frames played.
+        """
+        self.assert_state_is(GameState.initialized)
+        self.set_state(GameState.game_playing)
+        self.game_play.open_level(level_file, show_hud=not self.headless)
+        for position, orientation in turrets:
+            self.game_play.sprite_manager.create_turret(
+                position=position, orientation=orientation
+            )
+        self.game_play.update_path_costs()
+        frames = self.game_play.loop(max_frames=max_frames)
+        return self.game_play.mode, frames
+
     def init(self):
         """
         Initializes the game and configures pygame's SDL engine,
@@ -419,6 +549,12 @@ class TowerGame:
         loops.
         """
         self.assert_state_is(GameState.starting)
+        self._started_at = time.perf_counter()
+        if self.headless:
+            # SDL's dummy drivers need neither a display nor a sound
+            # card, so the game can run on a server.
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
         # Initialize and configure the display and mode for the game
         pg.init()
         # Configures fullscreen or windowed, the color depth (32 bits) and create the screen surface
@@ -427,14 +563,6 @@ class TowerGame:
         self.screen = pg.display.set_mode(
             self.screen_rect.size, window_style, bit_depth
         )
-        # Load the image tiles into the module-level dictionary `IMAGE_SPRITES`
-        for sprite_index, sprite_name in SPRITES.items():
-            img = import_image(sprite_name)
-            for flipped_x in (True, False):
-                for flipped_y in (True, False):
-                    new_img = pg.transform.flip(img, flip_x=flipped_x, flip_y=flipped_y)
-                    IMAGE_SPRITES[(flipped_x, flipped_y, sprite_index)] = new_img
-
         # Configure the sound mixer.
         pg.mixer.pre_init(
             frequency=44100,
@@ -443,20 +571,39 @@ class TowerGame:
             channels=2,
             buffer=512,
         )
-        if pg.mixer.get_init() is None:
-            pg.mixer = None
-        else:
-            # Load the sounds
-            for sound_key, sound_name in SOUNDS.items():
-                sound = import_sound(sound_name)
-                SOUNDS[sound_key] = sound
-
+        # Headless games, and machines without a sound card, get no
+        # sound: their channels stay `None`.
+        sound = not self.headless and pg.mixer.get_init() is not None
+        if sound:
             # Map the channels and channel names to a dedicated
             # `Channel` object sourced from pygame's sound mixer.
             for channel_id, channel_name in enumerate(self.channels):
                 self.channels[channel_name] = pg.mixer.Channel(channel_id)
                 # Configure the volume here.
                 self.channels[channel_name].set_volume(1.0)
+        # Load the image tiles and the sounds on a thread pool while
+        # a loading screen is shown.
+        images, sounds = import_assets(
+            image_names=SPRITES.values(),
+            sound_names=SOUNDS.values() if sound else (),
+            progress=None if self.headless else self.draw_loading_screen,
+        )
+        # Put the images into the module-level dictionary
+        # `IMAGE_SPRITES`. The flipped images are made on demand.
+        for sprite_index, sprite_name in SPRITES.items():
+            IMAGE_SPRITES[(False, False, sprite_index)] = images[sprite_name]
+        # Work out, up front, how far every animation frame has to be
+        # moved when it is flipped.
+        FLIP_OFFSETS.add(*chain.from_iterable(ANIMATIONS.values()))
+        if sound:
+            for sound_key, sound_name in SOUNDS.items():
+                SOUND_EFFECTS[sound_key] = sounds[sound_name]
+        log.info(
+            "Loaded assets",
+            images=len(images),
+            sounds=len(sounds),
+            seconds=round(time.perf_counter() - self._started_at, 3),
+        )
         # Load the font engine.
         pg.font.init()
         # Create the game loop state classes
@@ -787,6 +934,7 @@ class GameMenu(GameLoop):
             self.handle_events()
             menu.update()
             pg.display.flip()
+            self.game.log_first_frame()
             pg.display.set_caption(f"FPS {round(clock.get_fps())}")
             clock.tick(DESIRED_FPS)
         log.info("Exited menu")
@@ -877,7 +1025,22 @@ class GameEdit(GameLoop):
     The `mode` is the type of game mode to use when the game state is
     `GameState.game_playing`.
 
+    The `path_cache` holds the path finding graph for `level`. It is
+    rebuilt when a level is loaded and invalidated whenever a tile in
+    `level` is replaced.
+
     The `_last_selected_sprite` tracks the last selected item internally.
+
+    The `_path_overlay` is the path finding debug overlay, cached until
+    the `_path_overlay_key` it was drawn for changes.
+
+    The `_full_redraw` flag forces the next frame to repaint the whole
+    screen, even if `dirty_rects` is enabled. The `_drawn` dict tracks
+    what each sprite was last drawn as; see `draw_changed_sprites`.
+
+    The `_baked` flag is set while static sprites are baked, and
+    `_baked_sprites` holds the sprites that were baked; see
+    `bake_static_sprites`.
     """
 
     background: pg.Surface
@@ -886,8 +1049,15 @@ class GameEdit(GameLoop):
     layers: pg.sprite.LayeredUpdates
     sprite_manager: SpriteManager
     mode: GameMode
+    path_cache: PathCache
     # Internal states
     _last_selected_sprite: Optional[int] = field(init=False, default=None)
+    _path_overlay: Optional[pg.Surface] = field(init=False, default=None)
+    _path_overlay_key: Optional[tuple] = field(init=False, default=None)
+    _full_redraw: bool = field(init=False, default=True)
+    _drawn: dict = field(init=False, default_factory=dict)
+    _baked: bool = field(init=False, default=False)
+    _baked_sprites: list = field(init=False, default_factory=list)
 
     @classmethod
     def create(cls, game):
@@ -898,10 +1068,11 @@ class GameEdit(GameLoop):
             level=None,
             debug={
                 "show_path_finding": False,
+                "show_all_routes": False,
                 "show_collision_mask": False,
                 "show_grid_rect": False,
             },
-            mode=GameModeElimination.create(),
+            mode=GameModeElimination.create(navigation=game.navigation),
             layers=layers,
             sprite_manager=SpriteManager(
                 sprites=pg.sprite.LayeredUpdates(),
@@ -909,6 +1080,7 @@ class GameEdit(GameLoop):
                 layers=layers,
                 channels=game.channels,
             ),
+            path_cache=PathCache(navigation=game.navigation),
         )
 
     def create_blank_level(self):
@@ -926,7 +1098,12 @@ class GameEdit(GameLoop):
         of `shrubs`, load them into the game and reset the game.
         """
         self.layers.empty()
+        self._baked = False
+        self._baked_sprites = []
         self.level = create_background_tile_map(background)
+        self.path_cache.load(self.level)
+        if self.mode.navigation != Navigation.flow_field:
+            self.path_cache.refill(budget=None)
         self.draw_background()
         self.mode.reset()
         if show_hud:
@@ -950,11 +1127,80 @@ class GameEdit(GameLoop):
         This is done exactly once: the backgrounds are static and does
         not otherwise update once the game is started.
         """
+        self._full_redraw = True
         self.background.blit(IMAGE_SPRITES[(False, False, "backdrop")], (0, 0))
         for (y, x, dx, dy) in tile_positions():
             background_tile = self.level[y][x]
             self.background.blit(background_tile.image, (dx, dy))
 
+    def bake_static_sprites(self):
+        """
+        Bakes the sprites that never change during play, such as
+        shrubs and decals, so they are no longer updated and drawn
+        one by one every frame.
+
+        Sprites below `Layer.turret` are drawn onto the background.
+        The rest are flattened into a `StaticLayer` per layer, so they
+        are still drawn on top of turrets.
+        """
+        if self._baked:
+            return
+        self._baked = True
+        self._baked_sprites = [
+            sprite
+            for sprite in self.layers.sprites()
+            if isinstance(sprite, Background)
+            and sprite not in self.sprite_manager.sprites
+        ]
+        flattened = {}
+        for sprite in self._baked_sprites:
+            if sprite.layer < Layer.turret:
+                self.background.blit(sprite.image, sprite.rect)
+            else:
+                flattened.setdefault(sprite.layer, []).append(sprite)
+        self.layers.remove(*self._baked_sprites)
+        for layer, sprites in flattened.items():
+            StaticLayer(groups=[self.layers], layer=layer, sprites=sprites)
+        self._full_redraw = True
+
+    def restore_static_sprites(self):
+        """
+        Undoes `bake_static_sprites`, so the sprites can be edited again.
+        """
+        if not self._baked:
+            return
+        self._baked = False
+        for sprite in self.layers.sprites():
+            if isinstance(sprite, StaticLayer):
+                sprite.kill()
+        self.layers.add(*self._baked_sprites)
+        self._baked_sprites = []
+        self.draw_background()
+
+    def set_tile(self, gx, gy, tile):
+        """
+        Replaces the background tile at grid position (`gx`, `gy`)
+        with `tile` and updates the path finding cache.
+        """
+        self.level[gy][gx] = tile
+        self.path_cache.update_tile(gx, gy)
+
+    def update_path_costs(self):
+        """
+        Makes the tiles around every turret more expensive for
+        enemies to walk through when they take the shortest path.
+        """
+        if self.mode.navigation != Navigation.shortest_path:
+            return
+        turrets = self.layers.get_sprites_from_layer(Layer.turret)
+        self.path_cache.set_costs(
+            get_turret_costs(
+                get_tile_position(turret.rect.center)
+                for turret in turrets
+                if turret not in self.sprite_manager.sprites
+            )
+        )
+
     def make_hud(self):
         """
         Creates the HUD text
@@ -973,25 +1219,66 @@ class GameEdit(GameLoop):
         return hud
 
     def draw(self):
-        # Repaint background
-        self.screen.blit(self.background, (0, 0))
+        """
+        Updates and draws all sprites. Returns the list of rects
+        that changed on the screen, or None if all of it did.
+        """
+        # Debug overlays are drawn straight onto the screen, so
+        # repaint all of it while they are shown, and once more after
+        # they are hidden to erase them. `show_all_routes` only changes
+        # what the path finding overlay shows, so it does not count.
+        overlays = any(
+            self.debug[flag]
+            for flag in ("show_path_finding", "show_collision_mask", "show_grid_rect")
+        )
         # Instruct all sprites to update
+        TIMELINE.advance()
         self.layers.update()
+        if self.game.headless:
+            return None
+        if self.game.dirty_rects and not (overlays or self._full_redraw):
+            return draw_changed_sprites(
+                self.layers.sprites(), self.screen, self.background, self._drawn
+            )
+        self._full_redraw = overlays
+        # Repaint background
+        self.screen.blit(self.background, (0, 0))
         self.layers.draw(self.screen)
+        self._drawn = {
+            sprite: (sprite.image, sprite.rect.copy()) for sprite in self.layers
+        }
+        return None
 
-    def loop(self):
+    def loop(self, max_frames=None):
         """
         Combined game loop for both map editing and game playing.
+
+        Stops after `max_frames` frames, if given. Returns the number
+        of frames played.
         """
         clock = pg.time.Clock()
-        self.draw_background()
+        if not self.game.headless:
+            self.draw_background()
+        frames = 0
         while self.state in (GameState.map_editing, GameState.game_playing):
+            if frames == max_frames:
+                break
+            frames += 1
             mouse_pos = pg.mouse.get_pos()
             m_x, m_y = get_tile_position(mouse_pos)
             self.handle_events()
-            self.draw()
+            # Static sprites are only baked to draw them faster.
+            if not self.game.headless:
+                if self.state == GameState.game_playing:
+                    self.bake_static_sprites()
+                else:
+                    self.restore_static_sprites()
+            dirty = self.draw()
             # Handle collision
             self.handle_collision()
+            if self.mode.navigation != Navigation.flow_field:
+                # Top up the route pools if the level was edited.
+                self.path_cache.refill()
             if self.state == GameState.game_playing:
                 # Check for victory (or loss) if we are in GameState.game_playing mode
                 if self.mode.check_win_or_loss():
@@ -1000,29 +1287,78 @@ class GameEdit(GameLoop):
                 enemies_to_spawn = self.mode.next()
                 for _ in range(enemies_to_spawn):
                     self.spawn_enemy()
+            if self.game.headless:
+                # Nothing is shown, so there is no frame rate to keep
+                # to either.
+                clock.tick()
+                continue
             if self.debug["show_grid_rect"]:
                 pg.draw.rect(
                     self.screen, "darkgoldenrod4", get_grid_rect(m_x, m_y), width=2
                 )
             if self.debug["show_path_finding"]:
-                paths = update_path_finding(self.level)
-                for (idx, (start_tile, stop_tile)) in enumerate(paths):
-                    path = get_directions(start_tile, [stop_tile.position])
-                    for v1, v2 in path:
-                        pg.draw.line(
-                            self.screen,
-                            PATH_COLORS[idx % len(PATH_COLORS)],
-                            v1,
-                            v2,
-                            width=2,
-                        )
+                self.draw_path_overlay()
             # Debug FPS and Mouse coordinates
             pg.display.set_caption(
                 f"FPS {round(clock.get_fps())} Mouse: {mouse_pos} Grid: {(m_x,m_y)}"
             )
-            pg.display.flip()
+            if dirty is None:
+                pg.display.flip()
+            else:
+                pg.display.update(dirty)
             clock.tick(DESIRED_FPS)
+        log.debug("Rotation cache stats", **CACHE.stats())
+        log.debug("Text cache stats", **TEXT_CACHE.stats())
         self.layers.empty()
+        self._baked = False
+        self._baked_sprites = []
+        return frames
+
+    def draw_path_overlay(self):
+        """
+        Blits the path finding debug overlay to the screen.
+
+        The overlay is drawn once into a transparent surface and reused
+        until the routes change, which happens when the level is edited
+        and while the route pools fill up.
+        """
+        pools = self.path_cache.routes
+        if self._path_overlay_key != self._get_path_overlay_key(pools):
+            self._path_overlay = self.make_path_overlay(pools)
+            self._path_overlay_key = self._get_path_overlay_key(pools)
+        self.screen.blit(self._path_overlay, (0, 0))
+
+    def _get_path_overlay_key(self, pools):
+        return (
+            self.path_cache.generation,
+            self.debug["show_all_routes"],
+            sum(len(pool.routes) for pool in pools),
+        )
+
+    def make_path_overlay(self, pools):
+        """
+        Draws the first route of each of the route `pools` into a
+        transparent surface, or every route in them if
+        `show_all_routes` is enabled.
+        """
+        overlay = create_surface()
+        overlay.fill((0, 0, 0, 0))
+        for (idx, pool) in enumerate(pools):
+            if not pool.routes:
+                pool.add_route()
+            routes = pool.routes
+            if not self.debug["show_all_routes"]:
+                routes = routes[:1]
+            for route in routes:
+                for v1, v2 in get_route_directions(route):
+                    pg.draw.line(
+                        overlay,
+                        PATH_COLORS[idx % len(PATH_COLORS)],
+                        v1,
+                        v2,
+                        width=2,
+                    )
+        return overlay
 
     def handle_collision(self):
         """
@@ -1087,7 +1423,7 @@ class GameEdit(GameLoop):
                 enemy.kill()
                 channel = self.game.channels["score"]
                 if channel is not None:
-                    channel.play(SOUNDS["beep"])
+                    channel.play(SOUND_EFFECTS["beep"])
 
     def select_sprite(self, index: Optional[int]):
         """
@@ -1127,20 +1463,25 @@ class GameEdit(GameLoop):
 
     def spawn_enemy(self):
         """
-        Updates the path finding and spawns a enemy.
+        Spawns a enemy along one of the paths in the path cache.
         """
-        # NOTE: This could easily be done just once before the game is
-        # started, as the path finding is not going to change in game
-        # play mode.
-        paths = update_path_finding(self.level)
+        paths = self.path_cache.paths
         if paths:
-            # Pick a random path combination.
-            start_tile, stop_tile = random.choice(paths)
-            # Generate a path for the enemy to travel.
-            path = make_enemy_path(start_tile, [stop_tile.position])
             # Give it a dummy position of (0,0) as enemies'll snap to
             # the first path position on update.
-            self.sprite_manager.create_enemy(position=(0, 0), path=path)
+            if self.mode.navigation == Navigation.flow_field:
+                # Pick a random path combination and generate a path
+                # for the enemy to travel.
+                start_tile, _ = random.choice(paths)
+                path = make_flow_field_path(self.path_cache, start_tile.position)
+                self.sprite_manager.create_enemy(position=(0, 0), path=path)
+            else:
+                # Pick a random path combination and one of its
+                # precomputed trajectories.
+                pool = random.choice(self.path_cache.routes)
+                self.sprite_manager.create_enemy(
+                    position=(0, 0), trajectory=pool.sample(), jitter=make_jitter()
+                )
         else:
             # Place an enemy at the mouse cursor if we're in map editing mode.
             if self.state == GameState.map_editing:
@@ -1174,13 +1515,14 @@ class GameEdit(GameLoop):
                             # tile grid uses the top-left coordinates
                             # instead!
                             gx, gy = get_tile_position(sprite.rect.topleft)
-                            self.level[gy][gx] = sprite
+                            self.set_tile(gx, gy, sprite)
                         else:
                             # If it's not a background sprite, just
                             # place the sprite with the sprite manager
                             # at the mouse position
                             self.sprite_manager.place(self.mouse_position)
                     self.sprite_manager.empty()
+                    self.update_path_costs()
                     # If we're editing the map, we re-select the last
                     # sprite to cut down on tedium when building a
                     # map.
@@ -1199,6 +1541,7 @@ class GameEdit(GameLoop):
                     for found_sprite in found_sprites:
                         if found_sprite.layer != Layer.background:
                             found_sprite.kill()
+                    self.update_path_costs()
         # Keyboard Events
         if event.type == pg.KEYDOWN:
             if event.key in (pg.K_q, pg.K_e):
@@ -1217,6 +1560,8 @@ class GameEdit(GameLoop):
                 self.debug["show_collision_mask"] = not self.debug[
                     "show_collision_mask"
                 ]
+            elif event.key == pg.K_F3:
+                self.debug["show_all_routes"] = not self.debug["show_all_routes"]
             elif self.state == GameState.map_editing:
                 if event.key == pg.K_F9:
                     self.try_open_level()
@@ -1265,14 +1610,53 @@ class GameEdit(GameLoop):
                 )
 
 
-def start_game():
+def start_game(navigation=Navigation.path, dirty_rects=False):
     """
     Default entrypoint for the game
     """
-    game = TowerGame.create()
+    game = TowerGame.create(navigation=navigation, dirty_rects=dirty_rects)
     game.start_game()
 
 
+def simulate_game(level_file, turrets=(), max_frames=None, navigation=Navigation.path):
+    """
+    Entrypoint for headless simulations. Plays `level_file` with
+    `turrets` placed, as fast as possible, and returns a dict of how
+    the game went.
+    """
+    game = TowerGame.create(navigation=navigation, headless=True)
+    start = time.perf_counter()
+    mode, frames = game.simulate(level_file, turrets=turrets, max_frames=max_frames)
+    seconds = time.perf_counter() - start
+    game.quit()
+    return {
+        "frames": frames,
+        "seconds": seconds,
+        "fps": frames / seconds if seconds else None,
+        "killed": mode.killed,
+        "escaped": mode.escaped,
+        "intensity": mode.intensity,
+        "won": mode.has_won(),
+        "lost": mode.has_lost(),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_tk_root():
+    """
+    Returns the root window Tkinter needs for the open and save
+    dialogs, hidden so it does not show up on screen.
+
+    Tkinter is only imported, and the window made, the first time a
+    dialog is opened, so headless games never need a display for it.
+    """
+    import tkinter
+
+    root = tkinter.Tk()
+    root.withdraw()
+    return root
+
+
 @contextmanager
 def open_dialog(title="Open file...", filetypes=(("Tower Defense Levels", "*.json"),)):
     """
@@ -1280,6 +1664,9 @@ def open_dialog(title="Open file...", filetypes=(("Tower Defense Levels", "*.jso
     None if the user exits it without selecting. If there is a file it
     is closed when the context manager exits.
     """
+    import tkinter.filedialog
+
+    get_tk_root()
     try:
         f = tkinter.filedialog.askopenfile(title=title, filetypes=filetypes)
         yield f
@@ -1290,6 +1677,9 @@ def open_dialog(title="Open file...", filetypes=(("Tower Defense Levels", "*.jso
 
 @contextmanager
 def save_dialog(title="Save file...", filetypes=(("Tower Defense Levels", "*.json"),)):
+    import tkinter.filedialog
+
+    get_tk_root()
     f = tkinter.filedialog.asksaveasfile(title=title, filetypes=filetypes)
     try:
         yield f
@@ -1,26 +1,249 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import importlib.resources
+import json
+import mmap
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+
 import pygame as pg
+from structlog import get_logger
+
+from tower.constants import ASSET_CACHE_ENV, ASSET_CACHE_VERSION, ATLAS_MANIFEST
+
+log = get_logger()
+
+# Header of a cached image: its width and height.
+IMAGE_HEADER = struct.Struct("<II")
 
 
 def load(module_path, name):
     return importlib.resources.path(module_path, name)
 
 
+def get_asset_cache_dir():
+    """
+    Returns the directory decoded assets are cached in, or None if
+    the cache is disabled.
+    """
+    cache_dir = os.environ.get(ASSET_CACHE_ENV)
+    if cache_dir is None:
+        cache_dir = Path(
+            os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache", "tower"
+        )
+    elif not cache_dir:
+        return None
+    return Path(cache_dir, f"v{ASSET_CACHE_VERSION}")
+
+
+def get_cache_path(resource, *params):
+    """
+    Reads the asset at `resource` and returns the path it is cached
+    at, keyed by a hash of its content and `params`, or None if the
+    cache is disabled.
+    """
+    cache_dir = get_asset_cache_dir()
+    if cache_dir is None:
+        return None
+    digest = hashlib.sha1(repr(params).encode())
+    digest.update(Path(resource).read_bytes())
+    return cache_dir / digest.hexdigest()
+
+
+@contextmanager
+def map_cache_file(cache_path):
+    """
+    Context manager that memory maps `cache_path` and yields it, or
+    yields None if it is not cached.
+    """
+    try:
+        with open(cache_path, "rb") as cache_file:
+            mapped = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        # N.B.: mmap raises ValueError for empty files.
+        yield None
+        return
+    try:
+        with memoryview(mapped) as view:
+            yield view
+    finally:
+        mapped.close()
+
+
+def write_cache_file(cache_path, *chunks):
+    """
+    Writes `chunks` of bytes to `cache_path`. Failing to do so is
+    not fatal; the asset is merely decoded again the next time.
+    """
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so another instance of the
+        # game never maps a half-written file.
+        temp_path = cache_path.with_name(
+            f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(temp_path, "wb") as cache_file:
+            for chunk in chunks:
+                cache_file.write(chunk)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        log.warning("Could not cache asset", cache_path=str(cache_path), error=str(e))
+
+
 def import_sound(asset_name: str):
     """
     Imports, as a sound effect, `asset_name`.
+
+    The decoded samples are cached on disk, so only the first launch
+    has to decode the sound file. Safe to call from any thread.
     """
     with load("tower.assets.audio", asset_name) as resource:
-        return pg.mixer.Sound(resource)
+        # The samples are stored in whatever format the mixer uses.
+        cache_path = get_cache_path(resource, "sound", pg.mixer.get_init())
+        if cache_path is None:
+            return pg.mixer.Sound(resource)
+        with map_cache_file(cache_path) as cached:
+            if cached is not None:
+                return pg.mixer.Sound(buffer=cached)
+        sound = pg.mixer.Sound(resource)
+        write_cache_file(cache_path, sound.get_raw())
+        return sound
 
 
-def import_image(asset_name: str):
+def decode_image(asset_name: str):
     """
-    Imports, as an image, `asset_name`.
+    Decodes, but does not convert, the image `asset_name`. Safe to
+    call from any thread.
+
+    The decoded pixels are cached on disk, so only the first launch
+    has to decode the image file. Returns the image and the path it
+    should be cached at once it is converted, or None if it came
+    from the cache (or the cache is disabled).
     """
     with load("tower.assets.gfx", asset_name) as resource:
-        return pg.image.load(resource).convert_alpha()
+        cache_path = get_cache_path(resource, "image", "RGBA")
+        if cache_path is None:
+            return pg.image.load(resource), None
+        with map_cache_file(cache_path) as cached:
+            if cached is not None and len(cached) >= IMAGE_HEADER.size:
+                width, height = IMAGE_HEADER.unpack_from(cached)
+                with cached[IMAGE_HEADER.size :] as pixels:
+                    if len(pixels) == width * height * 4:
+                        # Copy the pixels out, as the file is unmapped
+                        # long before the image is converted.
+                        shared = pg.image.frombuffer(pixels, (width, height), "RGBA")
+                        image = shared.copy()
+                        del shared
+                        return image, None
+        return pg.image.load(resource), cache_path
+
+
+def convert_image(image: pg.Surface, cache_path=None):
+    """
+    Converts `image`, as returned by `decode_image`, to the pixel
+    format of the display, and caches it at `cache_path` if given.
+
+    SDL wants this done on the main thread.
+    """
+    image = image.convert_alpha()
+    if cache_path is not None:
+        write_cache_file(
+            cache_path,
+            IMAGE_HEADER.pack(*image.get_size()),
+            pg.image.tobytes(image, "RGBA"),
+        )
+    return image
+
+
+def read_atlas_manifest(manifest_name: str = ATLAS_MANIFEST):
+    """
+    Reads the texture atlas manifest `manifest_name`, or returns None
+    if there is no atlas.
+    """
+    try:
+        with load("tower.assets.gfx", manifest_name) as resource:
+            with resource.open() as manifest_file:
+                return json.load(manifest_file)
+    except FileNotFoundError:
+        log.debug("No texture atlas found", manifest=manifest_name)
+        return None
+
+
+def slice_atlas(manifest, sheets):
+    """
+    Returns a dict of the image asset names in `manifest` to
+    subsurfaces of `sheets`, the converted sheets it lists.
+    """
+    return {
+        asset_name: sheets[image["sheet"]].subsurface(image["rect"])
+        for asset_name, image in manifest["images"].items()
+    }
+
+
+def import_images(asset_names):
+    """
+    Imports, as images, all of `asset_names`. Images are sliced out
+    of the texture atlas if they are in it, and are otherwise loaded
+    from their own files. Returns a dict of asset names to images.
+    """
+    images, _ = import_assets(image_names=asset_names)
+    return images
+
+
+def import_assets(image_names=(), sound_names=(), progress=None, max_workers=None):
+    """
+    Imports `image_names` as images, like `import_images`, and
+    `sound_names` as sound effects, decoding them on a pool of
+    `max_workers` threads. pygame lets go of the GIL while it
+    decodes, so the files are decoded in parallel.
+
+    Converting the images to the display's pixel format is all that
+    happens on the calling thread, as each image comes in. So does
+    calling `progress`, if given, with the number of files imported
+    so far and the total after each file -- use it to draw a loading
+    screen.
+
+    Returns a tuple of dicts of asset names to images and to sounds.
+    """
+    image_names = list(dict.fromkeys(image_names))
+    sound_names = list(dict.fromkeys(sound_names))
+    manifest = read_atlas_manifest() or {"sheets": [], "images": {}}
+    file_names = list(
+        dict.fromkeys(
+            [
+                *manifest["sheets"],
+                *(name for name in image_names if name not in manifest["images"]),
+            ]
+        )
+    )
+    total = len(file_names) + len(sound_names)
+    converted = {}
+    sounds = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        image_futures = {
+            executor.submit(decode_image, name): name for name in file_names
+        }
+        sound_futures = {
+            executor.submit(import_sound, name): name for name in sound_names
+        }
+        for done, future in enumerate(
+            as_completed([*image_futures, *sound_futures]), 1
+        ):
+            if future in image_futures:
+                converted[image_futures[future]] = convert_image(*future.result())
+            else:
+                sounds[sound_futures[future]] = future.result()
+            if progress is not None:
+                progress(done, total)
+    atlas = slice_atlas(manifest, [converted[name] for name in manifest["sheets"]])
+    images = {
+        name: atlas[name] if name in atlas else converted[name] for name in image_names
+    }
+    return images, sounds
 
 
 def import_level(asset_name: str):
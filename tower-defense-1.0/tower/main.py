@@ -1,7 +1,20 @@
 # -*- coding: utf-8 -*-
+import json
+import os
+import random
+import sys
+
+# pygame greets you on stdout when it is imported, which would end up
+# in the JSON printed by `simulate`.
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import structlog
 from structlog import get_logger
 import click
-from tower.game import start_game
+from tower.atlas import build_sprite_atlas
+from tower.game import simulate_game, start_game
+from tower.loader import import_level
+from tower.pathfinding import Navigation
 
 log = get_logger()
 
@@ -14,8 +27,92 @@ def main():
 
 
 @main.command(help="Launches the Tower Defense Game")
-def launch():
-    start_game()
+@click.option(
+    "--navigation",
+    type=click.Choice([navigation.value for navigation in Navigation]),
+    default=Navigation.path.value,
+    show_default=True,
+    help="How enemies find their way to the escape tiles.",
+)
+@click.option(
+    "--dirty-rects/--no-dirty-rects",
+    default=False,
+    show_default=True,
+    help="Repaint only the parts of the screen that changed.",
+)
+def launch(navigation, dirty_rects):
+    start_game(navigation=Navigation(navigation), dirty_rects=dirty_rects)
+
+
+def parse_turret(ctx, param, value):
+    """
+    Parses a list of `X,Y[,ORIENTATION]` strings into tuples of
+    position and orientation.
+    """
+    turrets = []
+    for turret in value:
+        try:
+            x, y, *orientation = (int(n) for n in turret.split(","))
+        except ValueError:
+            raise click.BadParameter("turrets must be given as X,Y[,ORIENTATION]")
+        if len(orientation) > 1:
+            raise click.BadParameter("turrets must be given as X,Y[,ORIENTATION]")
+        turrets.append(((x, y), orientation[0] if orientation else 90))
+    return turrets
+
+
+@main.command(help="Plays a level without a display, as fast as possible")
+@click.option(
+    "--level",
+    type=click.File("r"),
+    default=None,
+    help="Level file to play. Defaults to the demo level.",
+)
+@click.option(
+    "--turret",
+    "turrets",
+    multiple=True,
+    callback=parse_turret,
+    help=(
+        "Turret to place, as X,Y[,ORIENTATION] in pixels."
+        " May be given more than once."
+    ),
+)
+@click.option(
+    "--frames",
+    default=36000,
+    show_default=True,
+    help="Stop after this many frames, if the game has not ended by then.",
+)
+@click.option(
+    "--navigation",
+    type=click.Choice([navigation.value for navigation in Navigation]),
+    default=Navigation.path.value,
+    show_default=True,
+    help="How enemies find their way to the escape tiles.",
+)
+@click.option("--seed", type=int, default=None, help="Random number generator seed.")
+def simulate(level, turrets, frames, navigation, seed):
+    # Only the results go to stdout, so they can be parsed as JSON.
+    structlog.configure(logger_factory=structlog.PrintLoggerFactory(sys.stderr))
+    if seed is not None:
+        random.seed(seed)
+    result = simulate_game(
+        level if level is not None else import_level("demo.json"),
+        turrets=turrets,
+        max_frames=frames,
+        navigation=Navigation(navigation),
+    )
+    click.echo(json.dumps(result, indent=2))
+
+
+@main.command("build-atlas", help="Packs the sprite images into a texture atlas")
+def build_atlas():
+    manifest = build_sprite_atlas()
+    click.echo(
+        f"Packed {len(manifest['images'])} images into"
+        f" {len(manifest['sheets'])} sheets"
+    )
 
 
 if __name__ == "__main__":
@@ -1,46 +1,144 @@
 # -*- coding: utf-8 -*-
+import enum
+import heapq
 import random
+from array import array
+from collections import deque
 from dataclasses import dataclass, field
-from itertools import chain
-from typing import Optional, Tuple
+from functools import partial
+from itertools import count
+from typing import Callable, Optional, Tuple
 
+import numpy as np
 import pygame as pg
 from structlog import get_logger
 from pygame.math import Vector2 as Vector
 
 from tower.constants import (
+    DEFAULT_TILE_COST,
     MOVABLE_TILE_IDS,
+    PATH_POOL_SIZE,
     START_TILE_ID,
     STOP_TILE_ID,
-    TILES_X,
-    TILES_Y,
+    TILE_COSTS,
+    TILE_HEIGHT,
+    TILE_WIDTH,
+    TURRET_COST_RADIUS,
+    TURRET_TILE_COST,
+)
+from tower.helpers import (
+    angle_to,
+    get_grid_rect,
+    interpolate,
+    pairwise,
 )
-from tower.helpers import angle_to, interpolate, tile_positions, pairwise
 
 log = get_logger()
 
 
-def get_portals(tile_map, start_tile_index, stop_tile_index):
+class Navigation(enum.Enum):
+    """
+    Ways an enemy can navigate from a start tile to a stop tile.
+    """
+
+    # Every enemy walks its own randomized path from `dfs_find_path`
+    path = "path"
+    # Every enemy walks down the gradient of a shared flow field
+    flow_field = "flow_field"
+    # Every enemy walks a cheapest path from `astar_find_path`
+    shortest_path = "shortest_path"
+
+
+def get_portals(tile_map, start_tile_index, stop_tile_index, tile_index=None):
     """
     Given a `tile_map`, walk through tile-by-tile and record all
     start and stop positions.
 
     The tiles used for either is controlled by `start_tile_index` and
-    `stop_tile_index`.
+    `stop_tile_index`. If a `tile_index` of `tile_map` is given, the
+    positions are looked up in it instead.
 
     Return two sets, each containing the stop or start positions.
     """
+    if tile_index is not None:
+        return (
+            set(tile_index.positions(start_tile_index)),
+            set(tile_index.positions(stop_tile_index)),
+        )
     start_positions = set()
     stop_positions = set()
-    for (gy, gx, _, _) in tile_positions():
-        tile = tile_map[gy][gx]
-        if tile.index == start_tile_index:
-            start_positions.add((gx, gy))
-        elif tile.index == stop_tile_index:
-            stop_positions.add((gx, gy))
+    for gy, row in enumerate(tile_map):
+        for gx, tile in enumerate(row):
+            if tile.index == start_tile_index:
+                start_positions.add((gx, gy))
+            elif tile.index == stop_tile_index:
+                stop_positions.add((gx, gy))
     return start_positions, stop_positions
 
 
+@dataclass
+class TileIndex:
+    """
+    Maps every kind of tile (its `index`, like `road_spawn`) in
+    `tile_map` to the set of grid positions it is placed at.
+
+    It is built once from `tile_map`. Call `update` whenever a tile is
+    replaced, and looking up or counting tiles of a kind never has to
+    scan the whole map.
+    """
+
+    tile_map: list = field(repr=False)
+    _positions: dict = field(init=False, repr=False, default_factory=dict)
+    _indices: dict = field(init=False, repr=False, default_factory=dict)
+
+    def __post_init__(self):
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuilds the index from `tile_map`.
+        """
+        self._positions.clear()
+        self._indices.clear()
+        for gy, row in enumerate(self.tile_map):
+            for gx, tile in enumerate(row):
+                self._add((gx, gy), tile.index)
+
+    def update(self, gx, gy):
+        """
+        Updates the index after the tile at (`gx`, `gy`) in `tile_map`
+        has been replaced.
+        """
+        position = (gx, gy)
+        index = self.tile_map[gy][gx].index
+        old_index = self._indices.get(position)
+        if index == old_index:
+            return
+        if old_index is not None:
+            positions = self._positions[old_index]
+            positions.discard(position)
+            if not positions:
+                del self._positions[old_index]
+        self._add(position, index)
+
+    def positions(self, index):
+        """
+        Returns the grid positions of tiles of `index`. The set is
+        owned by the index, so do not modify it.
+        """
+        return self._positions.get(index, frozenset())
+
+    def count(self, index):
+        """
+        Returns the number of tiles of `index`.
+        """
+        return len(self.positions(index))
+
+    def _add(self, position, index):
+        self._indices[position] = index
+        self._positions.setdefault(index, set()).add(position)
+
+
 @dataclass
 class GridTile:
     """
@@ -67,8 +165,8 @@ class GridTile:
 def dfs_find_path(start_tile: GridTile, stop_positions):
     """
     Given a starting tile `start_tile` and a set of
-    `stop_positions` recursively -- using Depth-First Search --
-    attempt to find *a* path to one of `stop_positions`.
+    `stop_positions` -- using Depth-First Search -- attempt to find
+    *a* path to one of `stop_positions`.
 
     Note this is not a shortest path algorithms like Dijkstra's
     Shortest Path or A*. Instead it randomly walks in a cardinal
@@ -78,48 +176,37 @@ def dfs_find_path(start_tile: GridTile, stop_positions):
     This approach is more organic as it allows for enemies to wander
     towards a goal without necessarily picking the optimal path.
 
-    The general principle of how `_walk` works is simple:
-
-    1. When _walk is invoked it's given a path list (it might be empty)
-    and the current tile it needs to investigate. if that tile is
-    already in `visited` or `None`, return an empty list.
+    Rather than recursing once per tile, which would exhaust Python's
+    recursion limit on large maps, the search keeps an explicit
+    `stack` of the tiles it is walking through:
 
-    2. Add the current tile to `visited` and check if the current tile
-    is a stop position. If it is, return the current tile + our path.
+    1. When a tile is visited, remember which tile we came from in
+    `parents`. If the tile is a stop position, we are done.
 
-    3. Given four cardinal directions (N, S, E, W) shuffle them and
-    call _walk on them, passing in our existing `path` plus the
-    current tile.
+    2. Otherwise, shuffle its four cardinal directions (N, S, E, W)
+    and push the tile, and its remaining directions, onto the stack.
 
-    4. If the return value of _walk is not an empty list, we exit ---
-    we found a path from start to stop. If it is not, try another
-    cardinal direction, and go to 1.
+    3. Take the next direction of the tile on top of the stack that
+    leads to a tile we have not yet visited, and go to 1. If it has
+    no directions left, pop it off the stack and backtrack.
 
+    Once a stop position is found, the path is rebuilt by following
+    `parents` back to `start_tile`. If the stack empties first, there
+    is no path and an empty list is returned.
     """
-
-    # Keep track of visited grid tiles
-    visited = {}
-
-    def _walk(
-        path: list,
-        current_tile: Optional[GridTile],
-    ):
-        # If the current_tile is None (i.e,. it is out of bounds or is
-        # not a valid direction) _or_ if we've visited the tile
-        # before, return an empty list indicating no path was found.
-        if current_tile is None or current_tile.position in visited:
-            return []
+    if start_tile is None:
+        return []
+    # Maps each visited grid position to the tile we visited it from.
+    parents = {}
+    stack = []
+    current_tile, parent_tile = start_tile, None
+    while True:
         # Make a note that we've now visited this position.
-        visited[current_tile.position] = current_tile
+        parents[current_tile.position] = parent_tile
         # If the current tile's position is a valid stop position then
-        # we have a path from the start to a stop tile. return the
-        # `path` we've travelled thus far and also include the current
-        # tile as that is the stop tile.
+        # we have a path from the start to a stop tile.
         if current_tile.position in stop_positions:
-            return path + [current_tile]
-        # All possible cardinal directions. Some may be None; that's
-        # OK, the recursive call checks if it's dealing with a None
-        # entry at the beginning.
+            break
         directions = [
             current_tile.east,
             current_tile.west,
@@ -131,19 +218,160 @@ def dfs_find_path(start_tile: GridTile, stop_positions):
         # through to a position. Leave it out to make it totally
         # deterministic
         random.shuffle(directions)
-        for direction in directions:
-            # Recursively call _walk with the current path travelled
-            # so far (plus our current tile) and the next tile
-            # (`direction`) to check along.
-            subpath = _walk(path + [current_tile], direction)
-            # If we get a subpath back from _walk, then that means it
-            # found a solution --- we can then exit knowing that we've
-            # found _a_ path to a stop position
-            if subpath:
-                return subpath
+        stack.append((current_tile, iter(directions)))
+        # Find the next tile to visit, backtracking through the stack
+        # until we find a tile with an unvisited direction.
+        while stack:
+            parent_tile, remaining = stack[-1]
+            current_tile = next(
+                (
+                    direction
+                    for direction in remaining
+                    if direction is not None and direction.position not in parents
+                ),
+                None,
+            )
+            if current_tile is not None:
+                break
+            stack.pop()
+        else:
+            return []
+    return rebuild_path(parents, current_tile)
+
+
+def rebuild_path(parents, stop_tile: GridTile):
+    """
+    Given a dictionary of `parents`, mapping each visited grid
+    position to the tile it was visited from, walk back from
+    `stop_tile` to the start tile and return the path between them.
+    """
+    path = []
+    current_tile = stop_tile
+    while current_tile is not None:
+        path.append(current_tile)
+        current_tile = parents[current_tile.position]
+    path.reverse()
+    return path
+
+
+def get_tile_cost(grid_tile: GridTile, costs):
+    """
+    Returns the cost of stepping onto `grid_tile`: the cost of its
+    tile index, from `TILE_COSTS`, plus any extra cost in `costs` for
+    its grid position.
+    """
+    return TILE_COSTS.get(grid_tile.tile.index, DEFAULT_TILE_COST) + costs.get(
+        grid_tile.position, 0
+    )
+
+
+def astar_find_path(start_tile: GridTile, stop_positions, costs=None):
+    """
+    Given a starting tile `start_tile` and a set of
+    `stop_positions`, use A* to find the cheapest path to one of
+    `stop_positions`.
+
+    Unlike `dfs_find_path`, every tile has a cost to step onto; see
+    `get_tile_cost`. The optional `costs` dictionary adds extra costs
+    by grid position, such as for tiles near turrets.
+
+    The heuristic is the Manhattan distance to the nearest stop
+    position multiplied by the cheapest tile cost, so it never
+    overestimates and the path found is always a cheapest one. Ties
+    between equally cheap tiles are broken at random, so enemies
+    still spread out over equally good paths.
+    """
+    stop_positions = set(stop_positions)
+    if start_tile is None or not stop_positions:
         return []
+    costs = costs or {}
+    cheapest = min(DEFAULT_TILE_COST, *TILE_COSTS.values())
+
+    def heuristic(position):
+        gx, gy = position
+        return cheapest * min(abs(gx - sx) + abs(gy - sy) for sx, sy in stop_positions)
+
+    # Maps each reached grid position to the tile we reached it from,
+    # and the cheapest known cost of getting there.
+    parents = {start_tile.position: None}
+    cost_so_far = {start_tile.position: 0}
+    closed = set()
+    # The counter ensures two heap entries never compare their tiles.
+    counter = count()
+    heap = [
+        (heuristic(start_tile.position), random.random(), next(counter), start_tile)
+    ]
+    while heap:
+        *_, current_tile = heapq.heappop(heap)
+        if current_tile.position in stop_positions:
+            return rebuild_path(parents, current_tile)
+        if current_tile.position in closed:
+            continue
+        closed.add(current_tile.position)
+        for direction in (
+            current_tile.east,
+            current_tile.west,
+            current_tile.north,
+            current_tile.south,
+        ):
+            if direction is None or direction.position in closed:
+                continue
+            cost = cost_so_far[current_tile.position] + get_tile_cost(direction, costs)
+            if cost < cost_so_far.get(direction.position, float("inf")):
+                cost_so_far[direction.position] = cost
+                parents[direction.position] = current_tile
+                heapq.heappush(
+                    heap,
+                    (
+                        cost + heuristic(direction.position),
+                        random.random(),
+                        next(counter),
+                        direction,
+                    ),
+                )
+    return []
+
+
+def get_turret_costs(
+    turret_positions, radius=TURRET_COST_RADIUS, penalty=TURRET_TILE_COST
+):
+    """
+    Returns a dictionary of extra costs, keyed by grid position,
+    for `astar_find_path`. Every tile within `radius` tiles of a
+    turret in `turret_positions` costs `penalty` more per turret, so
+    enemies steer clear of turrets where they can.
+    """
+    costs = {}
+    for tx, ty in turret_positions:
+        for gy in range(ty - radius, ty + radius + 1):
+            for gx in range(tx - radius, tx + radius + 1):
+                costs[(gx, gy)] = costs.get((gx, gy), 0) + penalty
+    return costs
+
+
+def make_route(start_tile: GridTile, stop_positions, find_path=dfs_find_path):
+    """
+    Find a path from `start_tile` to any of `stop_positions` with
+    `find_path` and return it as a compact array of grid positions,
+    laid out as `[gx0, gy0, gx1, gy1, ...]`.
+    """
+    route = array("H")
+    for tile in find_path(start_tile, stop_positions):
+        route.extend(tile.position)
+    return route
 
-    return _walk([], start_tile)
+
+def get_route_directions(route):
+    """
+    Given a `route` from `make_route`, return a list of vectors from
+    each tile's center rect position to the next.
+    """
+    return list(
+        pairwise(
+            Vector(get_grid_rect(gx, gy).center)
+            for gx, gy in zip(route[::2], route[1::2])
+        )
+    )
 
 
 def get_directions(start_tile: GridTile, stop_positions):
@@ -152,46 +380,58 @@ def get_directions(start_tile: GridTile, stop_positions):
     `stop_positions`. Return a list of vectors from each tile's center
     rect position to the next.
     """
-    try:
-        vectors = []
-        for a, b in pairwise(dfs_find_path(start_tile, stop_positions)):
-            v2 = Vector(b.tile.rect.center)
-            v1 = Vector(a.tile.rect.center)
-            vectors.append(
-                (
-                    v1,
-                    v2,
-                )
-            )
-    except StopIteration:
-        pass
-    return vectors
+    return get_route_directions(make_route(start_tile, stop_positions))
 
 
-def walk_grid(tile_map, visited, gx, gy, valid_tile_indices):
+def is_walkable(tile_index, valid_tile_indices=MOVABLE_TILE_IDS):
     """
-    Given a 2d grid of `tile_map`, recursively walk through it one
-    grid position at a time and build a graph of `GridTile` if the
-    tile index is one of `valid_tile_indices`.
+    Returns True if enemies can walk on tiles of `tile_index`:
+    either it is one of `valid_tile_indices` or it is a start or stop
+    tile.
     """
-    if not 0 <= gx < TILES_X or not 0 <= gy < TILES_Y:
-        return None
-    if tile := visited.get((gx, gy)):
-        return tile
-    tile = tile_map[gy][gx]
-    if tile.index in valid_tile_indices or tile.index in (
+    return tile_index in valid_tile_indices or tile_index in (
         STOP_TILE_ID,
         START_TILE_ID,
-    ):
-        tile = GridTile(tile=tile, position=(gx, gy))
-        visited[(gx, gy)] = tile
-        # Recursively check each cardinal direction
-        tile.east = walk_grid(tile_map, visited, gx + 1, gy, valid_tile_indices)
-        tile.west = walk_grid(tile_map, visited, gx - 1, gy, valid_tile_indices)
-        tile.north = walk_grid(tile_map, visited, gx, gy - 1, valid_tile_indices)
-        tile.south = walk_grid(tile_map, visited, gx, gy + 1, valid_tile_indices)
-        return tile
-    return None
+    )
+
+
+def walk_grid(tile_map, visited, gx, gy, valid_tile_indices):
+    """
+    Given a 2d grid of `tile_map`, walk through it one grid
+    position at a time, starting at (`gx`, `gy`), and build a graph of
+    `GridTile` if the tile index is one of `valid_tile_indices`.
+
+    Every `GridTile` is recorded in `visited`, keyed by its position,
+    and the one at (`gx`, `gy`) is returned. The walk uses an explicit
+    stack so it works on maps of any size.
+    """
+    height, width = len(tile_map), len(tile_map[0])
+    stack = []
+
+    def _visit(gx, gy):
+        if not 0 <= gx < width or not 0 <= gy < height:
+            return None
+        if tile := visited.get((gx, gy)):
+            return tile
+        tile = tile_map[gy][gx]
+        if is_walkable(tile.index, valid_tile_indices):
+            tile = GridTile(tile=tile, position=(gx, gy))
+            visited[(gx, gy)] = tile
+            # Its cardinal directions are linked up when it is popped
+            # off the stack.
+            stack.append(tile)
+            return tile
+        return None
+
+    start_tile = _visit(gx, gy)
+    while stack:
+        tile = stack.pop()
+        x, y = tile.position
+        tile.east = _visit(x + 1, y)
+        tile.west = _visit(x - 1, y)
+        tile.north = _visit(x, y - 1)
+        tile.south = _visit(x, y + 1)
+    return start_tile
 
 
 def make_enemy_path(start_tile, stop_position, jitter=10, speed=40, turn_speed=8):
@@ -204,49 +444,569 @@ def make_enemy_path(start_tile, stop_position, jitter=10, speed=40, turn_speed=8
     next. `turn_speed` controls how fast enemies turn when they have
     to rotate to move in another direction
     """
-    # Add a bit of jitter to the start and end position so they don't
-    # all spawn and despawn at the same relative point
+    return make_route_path(
+        make_route(start_tile, stop_position), jitter=jitter, speed=speed
+    )
+
+
+def make_jitter(jitter=10):
+    """
+    Returns a random offset of up to `jitter` pixels to add to an
+    enemy's path, so enemies don't all spawn and despawn at the same
+    relative point.
+    """
     jitter = random.randint(-jitter, jitter)
     # Use a hardcoded offset to ensure the sprite's feet are placed
     # within the sprite.
-    jv = Vector(jitter, -30 + jitter)
-    for v1, v2 in pairwise(
-        chain.from_iterable(
-            interpolate(t, speed) for t in get_directions(start_tile, stop_position)
-        )
-    ):
-        # Required; if v1 == v2, then v1 - v2 = 0, which is impossible to normalize.
-        if v1 == v2:
-            continue
-        dot = v1.normalize().dot((v2 - v1).normalize())
-        flipx = dot < 0
+    return Vector(jitter, -30 + jitter)
+
+
+@dataclass
+class Trajectory:
+    """
+    The walk along a `route` from `make_route`, precomputed one game
+    tick per row. `positions` holds the (x, y) position of each tick
+    and `flips` whether the sprite faces the other way.
+
+    Trajectories never change once made, so every enemy walking the
+    same route shares one. An enemy only keeps track of how far along
+    it is.
+    """
+
+    route: array = field(repr=False)
+    positions: np.ndarray = field(repr=False)
+    flips: np.ndarray = field(repr=False)
+
+    def __len__(self):
+        return len(self.flips)
+
+
+def make_trajectory(route, speed=40):
+    """
+    Given a `route` from `make_route`, precompute the `Trajectory`
+    along it, interpolating `speed` steps between each pair of tile
+    centers.
+
+    This is the NumPy equivalent of the `interpolate` and `pairwise`
+    generator chain: a position is only kept if it moved, and the
+    sprite is flipped if it is moving against the direction of its
+    position vector.
+    """
+    tiles = np.frombuffer(route, dtype=np.uint16).reshape(-1, 2)
+    centers = tiles * (TILE_WIDTH, TILE_HEIGHT) + (TILE_WIDTH // 2, TILE_HEIGHT // 2)
+    a, b = centers[:-1, np.newaxis], centers[1:, np.newaxis]
+    m = np.arange(speed + 1)[:, np.newaxis]
+    points = (a + (m * (b - a) / speed)).reshape(-1, 2)
+    v1, v2 = points[:-1], points[1:]
+    delta = v2 - v1
+    moved = delta.any(axis=1)
+    flips = (v1 * delta).sum(axis=1) < 0
+    return Trajectory(
+        route=route,
+        positions=np.ascontiguousarray(v2[moved]),
+        flips=np.ascontiguousarray(flips[moved]),
+    )
+
+
+def make_route_path(route, jitter=10, speed=40):
+    """
+    Given a `route` from `make_route`, create an interpolated path
+    along it that an enemy can walk. See `make_enemy_path`.
+    """
+    trajectory = make_trajectory(route, speed=speed)
+    jv = make_jitter(jitter)
+    for (x, y), flipx in zip(trajectory.positions.tolist(), trajectory.flips.tolist()):
         yield (
-            v2 + jv,
+            Vector(x, y) + jv,
             0,
             flipx,
         )
 
 
-def update_path_finding(tile_map):
+def make_flow_field(tile_map, valid_tile_indices=MOVABLE_TILE_IDS, tile_index=None):
+    """
+    Given a `tile_map`, use Breadth-First Search from all stop
+    positions at once to calculate how many steps each walkable tile
+    is from its nearest stop position. The stop positions are looked
+    up in `tile_index`, if it is given.
+
+    Returns a grid, in the same shape as `tile_map`, of step counts;
+    tiles that cannot reach a stop position are `None`.
+    """
+    height, width = len(tile_map), len(tile_map[0])
+    distances = [[None] * width for _ in range(height)]
+    _, stop_positions = get_portals(
+        tile_map, START_TILE_ID, STOP_TILE_ID, tile_index=tile_index
+    )
+    queue = deque()
+    for (gx, gy) in stop_positions:
+        distances[gy][gx] = 0
+        queue.append((gx, gy))
+    while queue:
+        gx, gy = queue.popleft()
+        distance = distances[gy][gx] + 1
+        for nx, ny in ((gx + 1, gy), (gx - 1, gy), (gx, gy - 1), (gx, gy + 1)):
+            if not 0 <= nx < width or not 0 <= ny < height:
+                continue
+            if distances[ny][nx] is not None:
+                continue
+            index = tile_map[ny][nx].index
+            if index in valid_tile_indices or index == START_TILE_ID:
+                distances[ny][nx] = distance
+                queue.append((nx, ny))
+    return distances
+
+
+def flow_field_step(distances, gx, gy):
+    """
+    Given a flow field of `distances`, return the grid position of
+    a neighbour of (`gx`, `gy`) that is one step closer to a stop
+    position, or `None` if there is none.
+
+    If more than one neighbour is equally close, pick one at random so
+    enemies wander through the map instead of marching in lockstep.
+    """
+    distance = distances[gy][gx]
+    if not distance:
+        return None
+    height, width = len(distances), len(distances[0])
+    candidates = [
+        (nx, ny)
+        for nx, ny in ((gx + 1, gy), (gx - 1, gy), (gx, gy - 1), (gx, gy + 1))
+        if 0 <= nx < width and 0 <= ny < height and distances[ny][nx] == distance - 1
+    ]
+    return random.choice(candidates)
+
+
+def make_flow_field_path(path_cache, start_position, jitter=10, speed=40):
+    """
+    Given a `path_cache` and a `start_position`, create an
+    interpolated path that follows the cache's flow field to the
+    nearest stop position.
+
+    Unlike `make_enemy_path`, the next tile is decided one tile at a
+    time and the flow field is looked up afresh every time, so an
+    enemy immediately reroutes if the map changes underneath it. If
+    its tile can no longer reach a stop position, the path ends.
+
+    `jitter` and `speed` work the same as they do in `make_enemy_path`.
+    """
+    jv = make_jitter(jitter)
+    gx, gy = start_position
+    while True:
+        next_position = flow_field_step(path_cache.flow_field, gx, gy)
+        if next_position is None:
+            return
+        v1 = Vector(get_grid_rect(gx, gy).center)
+        v2 = Vector(get_grid_rect(*next_position).center)
+        for a, b in pairwise(interpolate((v1, v2), speed)):
+            if a == b:
+                continue
+            dot = a.normalize().dot((b - a).normalize())
+            flipx = dot < 0
+            yield (
+                b + jv,
+                0,
+                flipx,
+            )
+        gx, gy = next_position
+
+
+def update_path_finding(tile_map, connectivity=None, tile_index=None):
     """
     Given a tile map, calculate all possible start/stop
     combinations that a enemy can move.
 
     This code is clever enough to distinguish between separate
-    'islands' of stop/start positions that do not overlap at all.
+    'islands' of stop/start positions that do not overlap at all. It
+    asks `connectivity` which stop positions share an island with each
+    start position; if it is not given, one is built from `tile_map`.
+    The start positions are looked up in `tile_index`, if it is given.
     """
-
-    start_positions, stop_positions = get_portals(tile_map, START_TILE_ID, STOP_TILE_ID)
+    if connectivity is None:
+        connectivity = Connectivity(tile_map)
+    start_positions, _ = get_portals(
+        tile_map, START_TILE_ID, STOP_TILE_ID, tile_index=tile_index
+    )
     paths = []
-    while start_positions:
-        visited = {}
-        gx, gy = start_positions.pop()
-        start_tile = walk_grid(tile_map, visited, gx, gy, MOVABLE_TILE_IDS)
+    # Shared between islands: walking the grid again from a start
+    # position on an island we have already walked costs nothing.
+    visited = {}
+    for gx, gy in start_positions:
         # Determine which stop tiles are reachable from start_positions
+        stop_positions = connectivity.reachable_stops((gx, gy))
+        if not stop_positions:
+            continue
+        start_tile = walk_grid(tile_map, visited, gx, gy, MOVABLE_TILE_IDS)
         for stop_position in stop_positions:
-            try:
-                paths.append((start_tile, visited[stop_position]))
-            except KeyError:
-                pass
+            paths.append((start_tile, visited[stop_position]))
 
     return paths
+
+
+@dataclass
+class Connectivity:
+    """
+    Keeps track of which walkable tiles in `tile_map` are connected
+    to one another -- the 'islands' of the map -- with a union-find
+    (or disjoint-set) structure.
+
+    Every island is represented by one of its grid positions, its
+    root, which `find` returns for any position on the island. For
+    each root we remember the island's `_members`, and which of them
+    are start and stop positions.
+
+    When a tile is replaced, call `update`. Making a tile walkable
+    merges it with its walkable neighbours' islands in near-constant
+    time. Union-find cannot split an island, so when a walkable tile
+    is removed only the island it was on is rebuilt from scratch.
+    """
+
+    tile_map: list = field(repr=False)
+    valid_tile_indices: set = field(default_factory=lambda: MOVABLE_TILE_IDS)
+    _parents: dict = field(init=False, repr=False, default_factory=dict)
+    _members: dict = field(init=False, repr=False, default_factory=dict)
+    _starts: dict = field(init=False, repr=False, default_factory=dict)
+    _stops: dict = field(init=False, repr=False, default_factory=dict)
+
+    def __post_init__(self):
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuilds every island from `tile_map`.
+        """
+        self._parents.clear()
+        self._members.clear()
+        self._starts.clear()
+        self._stops.clear()
+        for gy, row in enumerate(self.tile_map):
+            for gx, tile in enumerate(row):
+                if is_walkable(tile.index, self.valid_tile_indices):
+                    self._add((gx, gy))
+
+    def find(self, position):
+        """
+        Returns the root of the island `position` is on, or `None`
+        if it is not walkable.
+        """
+        if position not in self._parents:
+            return None
+        root = position
+        while (parent := self._parents[root]) != root:
+            root = parent
+        # Compress the path so the next lookup goes straight to the root.
+        while position != root:
+            position, self._parents[position] = self._parents[position], root
+        return root
+
+    def connected(self, position_a, position_b):
+        """
+        Returns True if `position_a` and `position_b` are on the same island.
+        """
+        root = self.find(position_a)
+        return root is not None and root == self.find(position_b)
+
+    def reachable_stops(self, position):
+        """
+        Returns the stop positions on the same island as `position`.
+        The set is owned by the island, so do not modify it.
+        """
+        root = self.find(position)
+        if root is None:
+            return frozenset()
+        return self._stops[root]
+
+    def update(self, gx, gy):
+        """
+        Updates the islands after the tile at (`gx`, `gy`) in
+        `tile_map` has been replaced.
+        """
+        position = (gx, gy)
+        walkable = is_walkable(self.tile_map[gy][gx].index, self.valid_tile_indices)
+        root = self.find(position)
+        if root is None:
+            if walkable:
+                self._add(position)
+        elif walkable:
+            # Still walkable, but it may have become (or stopped
+            # being) a start or stop tile.
+            self._starts[root].discard(position)
+            self._stops[root].discard(position)
+            self._tag(position, root)
+        else:
+            # Removing the tile may have split its island, so pull the
+            # island apart and put it back together without the tile.
+            members = self._members.pop(root)
+            del self._starts[root]
+            del self._stops[root]
+            for member in members:
+                del self._parents[member]
+            members.discard(position)
+            for member in members:
+                self._add(member)
+
+    def _add(self, position):
+        self._parents[position] = position
+        self._members[position] = {position}
+        self._starts[position] = set()
+        self._stops[position] = set()
+        self._tag(position, position)
+        gx, gy = position
+        for neighbour in ((gx + 1, gy), (gx - 1, gy), (gx, gy - 1), (gx, gy + 1)):
+            if neighbour in self._parents:
+                self._union(position, neighbour)
+
+    def _tag(self, position, root):
+        gx, gy = position
+        index = self.tile_map[gy][gx].index
+        if index == START_TILE_ID:
+            self._starts[root].add(position)
+        elif index == STOP_TILE_ID:
+            self._stops[root].add(position)
+
+    def _union(self, position_a, position_b):
+        root_a, root_b = self.find(position_a), self.find(position_b)
+        if root_a == root_b:
+            return
+        # Merge the smaller island into the larger one to keep both the
+        # trees and the sets we copy over small.
+        if len(self._members[root_a]) < len(self._members[root_b]):
+            root_a, root_b = root_b, root_a
+        self._parents[root_b] = root_a
+        self._members[root_a] |= self._members.pop(root_b)
+        self._starts[root_a] |= self._starts.pop(root_b)
+        self._stops[root_a] |= self._stops.pop(root_b)
+
+
+@dataclass
+class RoutePool:
+    """
+    Pool of up to `size` distinct, randomized routes from
+    `start_tile` to `stop_tile`, as made by `make_route` with
+    `find_path`, along with the `Trajectory` of each.
+
+    Enemies sample a trajectory from the pool instead of searching for
+    a fresh route every time they spawn. The pool is filled a few
+    searches at a time with `fill`. Not every map has `size` distinct
+    routes between two tiles, so the pool counts as `full` once it has
+    made `max_attempts` searches, too.
+    """
+
+    start_tile: GridTile
+    stop_tile: GridTile
+    size: int
+    find_path: Callable = dfs_find_path
+    routes: list = field(default_factory=list)
+    trajectories: list = field(default_factory=list)
+    attempts: int = 0
+    _seen: dict = field(init=False, repr=False, default_factory=dict)
+
+    @property
+    def max_attempts(self):
+        return self.size * 4
+
+    @property
+    def full(self):
+        return len(self.routes) >= self.size or self.attempts >= self.max_attempts
+
+    def add_route(self):
+        """
+        Searches for a new route and adds it to the pool if it is
+        not already in it. Returns the route's trajectory.
+        """
+        self.attempts += 1
+        route = make_route(
+            self.start_tile, [self.stop_tile.position], find_path=self.find_path
+        )
+        key = route.tobytes()
+        try:
+            return self._seen[key]
+        except KeyError:
+            trajectory = self._seen[key] = make_trajectory(route)
+            self.routes.append(route)
+            self.trajectories.append(trajectory)
+            return trajectory
+
+    def fill(self, budget=None):
+        """
+        Adds routes until the pool is full or `budget` searches
+        have been made. Returns the number of searches made.
+        """
+        searches = 0
+        while not self.full and (budget is None or searches < budget):
+            self.add_route()
+            searches += 1
+        return searches
+
+    def sample(self):
+        """
+        Returns the trajectory of a random route from the pool. If
+        the pool is empty, a route is searched for there and then.
+        """
+        if not self.trajectories:
+            return self.add_route()
+        return random.choice(self.trajectories)
+
+
+@dataclass
+class PathCache:
+    """
+    Per-level cache of everything the path finding derives from a
+    `tile_map`, such as the graph of `GridTile` start/stop pairs
+    returned by `update_path_finding`, a `RoutePool` of `pool_size`
+    routes for each of those pairs, and the flow field from
+    `make_flow_field`.
+
+    The islands of the tile map are tracked by `connectivity`, and
+    the positions of each kind of tile by `tile_index`. Both are kept
+    up to date tile by tile through `update_tile`.
+
+    The routes are found with `dfs_find_path` or, if `navigation` is
+    `Navigation.shortest_path`, with `astar_find_path` and the extra
+    tile `costs`.
+
+    Results are computed on first use and stored in `_cache`, keyed by
+    name, so repeat lookups are a dictionary lookup. The cache is only
+    invalidated when the tile map is loaded or edited; `generation`
+    increments every time that happens.
+
+    `hits` and `misses` count cache lookups that were (and were not)
+    served from the cache.
+    """
+
+    tile_map: Optional[list] = field(repr=False, default=None)
+    pool_size: int = PATH_POOL_SIZE
+    navigation: Navigation = Navigation.path
+    costs: dict = field(default_factory=dict)
+    connectivity: Optional[Connectivity] = field(repr=False, default=None)
+    tile_index: Optional[TileIndex] = field(repr=False, default=None)
+    generation: int = 0
+    hits: int = 0
+    misses: int = 0
+    _cache: dict = field(init=False, repr=False, default_factory=dict)
+
+    def load(self, tile_map):
+        """
+        Replaces the tile map with `tile_map` and eagerly rebuilds
+        the path graph.
+        """
+        self.tile_map = tile_map
+        self.connectivity = Connectivity(tile_map)
+        self.tile_index = TileIndex(tile_map)
+        self.invalidate()
+        return self.paths
+
+    def update_tile(self, gx, gy):
+        """
+        Updates the cache after the tile at (`gx`, `gy`) in the tile
+        map has been replaced.
+        """
+        self.connectivity.update(gx, gy)
+        self.tile_index.update(gx, gy)
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Discards everything cached for the current tile map.
+        """
+        log.debug(
+            "Invalidating path cache",
+            generation=self.generation,
+            hits=self.hits,
+            misses=self.misses,
+        )
+        self._cache.clear()
+        self.generation += 1
+
+    def set_costs(self, costs):
+        """
+        Replaces the extra tile `costs` used to find the shortest
+        path, and discards the route pools if that changes them.
+        """
+        if costs == self.costs:
+            return
+        self.costs = costs
+        if self.navigation == Navigation.shortest_path:
+            self._cache.pop("routes", None)
+            self.generation += 1
+
+    def lookup(self, key, factory):
+        """
+        Returns the value cached under `key`, calling `factory`
+        with the tile map to create it on a miss.
+        """
+        try:
+            value = self._cache[key]
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            value = self._cache[key] = factory(self.tile_map)
+        return value
+
+    @property
+    def paths(self):
+        """
+        Returns the cached start/stop pairs from `update_path_finding`.
+        """
+        return self.lookup(
+            "paths",
+            partial(
+                update_path_finding,
+                connectivity=self.connectivity,
+                tile_index=self.tile_index,
+            ),
+        )
+
+    @property
+    def routes(self):
+        """
+        Returns a cached `RoutePool` for each start/stop pair in
+        `paths`. The pools start out empty; see `refill`.
+        """
+        return self.lookup("routes", self._make_route_pools)
+
+    def _make_route_pools(self, tile_map):
+        if self.navigation == Navigation.shortest_path:
+            find_path = partial(astar_find_path, costs=self.costs)
+        else:
+            find_path = dfs_find_path
+        return [
+            RoutePool(
+                start_tile=start_tile,
+                stop_tile=stop_tile,
+                size=self.pool_size,
+                find_path=find_path,
+            )
+            for start_tile, stop_tile in self.paths
+        ]
+
+    def refill(self, budget=1):
+        """
+        Tops up the route pools, making at most `budget` searches,
+        or as many as it takes to fill them if `budget` is None.
+
+        Calling this once every game tick refills the pools in the
+        background after the cache is invalidated, without stalling
+        the game loop.
+        """
+        # Bypass `lookup` when the pools exist so the per-tick refill
+        # does not drown out the hit counter.
+        pools = self._cache.get("routes")
+        if pools is None:
+            pools = self.routes
+        for pool in pools:
+            searches = pool.fill(budget)
+            if budget is not None:
+                budget -= searches
+                if budget <= 0:
+                    break
+
+    @property
+    def flow_field(self):
+        """
+        Returns the cached flow field from `make_flow_field`.
+        """
+        return self.lookup(
+            "flow_field", partial(make_flow_field, tile_index=self.tile_index)
+        )
@@ -5,6 +5,7 @@ import random
 from dataclasses import dataclass, field
 from itertools import accumulate, chain, cycle, repeat, count
 from typing import Generator, Optional, Dict
+import numpy as np
 import pygame as pg
 from structlog import get_logger
 from pygame.math import Vector2 as Vector
@@ -12,17 +13,23 @@ from pygame.math import Vector2 as Vector
 from tower.constants import (
     ALLOWED_BG_SPRITES,
     ALLOWED_SHRUBS,
-    CACHE,
     FONT_NAME,
-    IMAGE_SPRITES,
     ANIMATIONS,
     SOUND_FOOTSTEPS,
     SOUND_TURRET,
-    SOUNDS,
     TILE_HEIGHT,
     TILE_WIDTH,
     VISION_RECT,
 )
+from tower.cache import (
+    CACHE,
+    FLIP_OFFSETS,
+    FONTS,
+    IMAGE_SPRITES,
+    SOUND_EFFECTS,
+    TEXT_CACHE,
+    VISION_SWEEPS,
+)
 from tower.helpers import create_surface, extend, interpolate
 
 log = get_logger()
@@ -51,13 +58,62 @@ class AnimationState(enum.Enum):
         expires (like a dying animation) and then have the animation
         routine auto-kill the sprite.
 
-        This, of course, will not trigger for animation generators
-        that never cause a `StopIteration`, nor for sprites where this
-        not desired, even if the animation is finite.
+        This, of course, will not trigger for looping animations that
+        never end, nor for sprites where this not desired, even if the
+        animation is finite.
         """
         return state in (cls.exploding, cls.dying)
 
 
+@dataclass
+class Timeline:
+    """
+    Global animation clock. `tick` is advanced once per game frame,
+    right before the sprites are updated, and every animation works
+    out which frame to show from how many ticks ago it started.
+    """
+
+    tick: int = 0
+
+    def advance(self):
+        self.tick += 1
+
+
+TIMELINE = Timeline()
+
+
+@dataclass(frozen=True)
+class Animation:
+    """
+    An animation that shows each of `frames`, a tuple of sprite
+    indices, for `hold` ticks. A `loop`ing animation starts over once
+    it reaches the end; any other one ends.
+
+    Animations hold no per-sprite state, so one of them is shared by
+    every sprite that plays it.
+    """
+
+    frames: tuple
+    hold: int = 1
+    loop: bool = False
+    # The sprite index to show on every tick of the animation.
+    ticks: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "ticks", tuple(extend(self.frames, self.hold)))
+
+    def get_frame(self, elapsed: int):
+        """
+        Returns the sprite index to show `elapsed` ticks into the
+        animation, or None if it has ended.
+        """
+        if self.loop:
+            return self.ticks[elapsed % len(self.ticks)]
+        if elapsed < len(self.ticks):
+            return self.ticks[elapsed]
+        return None
+
+
 class SpriteState(enum.Enum):
 
     """
@@ -87,6 +143,35 @@ class Layer(enum.IntEnum):
     hud = 60
 
 
+@dataclass
+class RotatedImage:
+    """
+    A rotated sprite `image` with its collision `mask` and `rect`,
+    stored together in `CACHE` so a sprite can switch to it without
+    rotating the image or recalculating the mask.
+    """
+
+    image: pg.Surface
+    mask: pg.mask.Mask
+    rect: pg.Rect
+
+    @classmethod
+    def create(cls, surface, angle):
+        """
+        Rotates `surface` by `angle` degrees.
+        """
+        image = pg.transform.rotate(surface, angle % 360)
+        return cls(image=image, mask=pg.mask.from_surface(image), rect=image.get_rect())
+
+    @property
+    def nbytes(self):
+        """
+        Approximate memory used by the image and its mask, in bytes.
+        """
+        width, height = self.rect.size
+        return self.image.get_pitch() * height + (width * height) // 8
+
+
 class Sprite(pg.sprite.Sprite):
     """
     Base class for sprites.
@@ -169,6 +254,7 @@ class Sprite(pg.sprite.Sprite):
         self.sounds = sounds
         self.orientation = orientation
         self.channel = channel
+        self._animation_state = None
         self.animation_state = animation_state
         self.sprite_offset = Vector(0, 0)
         self.angle = self.generate_rotation()
@@ -176,7 +262,6 @@ class Sprite(pg.sprite.Sprite):
         self.flipped_x = flipped_x
         self.flipped_y = flipped_y
         if self.image is not None:
-            self.mask = pg.mask.from_surface(self.image)
             self.surface = self.image.copy()
             self.rotate(self.orientation)
         if self.rect is not None and position is not None:
@@ -208,16 +293,16 @@ class Sprite(pg.sprite.Sprite):
         # angle we rotated to.
         if angle == self._last_angle:
             return
-        try:
-            k = (self.rotate_cache_key(), angle)
-            new_image = CACHE[k]
-        except KeyError:
-            new_image = pg.transform.rotate(self.surface, angle % 360)
-            CACHE[k] = new_image
-        new_rect = new_image.get_rect(center=self.rect.center)
-        self.image = new_image
-        self.rect = new_rect
-        self.mask = pg.mask.from_surface(self.image)
+        rotated = CACHE.get(
+            self.rotate_cache_key(), angle, RotatedImage.create, self.surface
+        )
+        # Resize our own rect, rather than copy the shared one, and
+        # keep it centered where it was.
+        center = self.rect.center
+        self.rect.size = rotated.rect.size
+        self.rect.center = center
+        self.image = rotated.image
+        self.mask = rotated.mask
         self._last_angle = angle
 
     def generate_rotation(self):
@@ -245,28 +330,48 @@ class Sprite(pg.sprite.Sprite):
         self.rotate(angle)
         self.animate()
 
+    @property
+    def animation_state(self):
+        """
+        The `AnimationState` the sprite is in. Changing it starts the
+        animation for the new state on the next tick of `TIMELINE`;
+        setting it to the state it is already in does nothing.
+
+        Together with `animation_start`, the tick the animation
+        started on, that is all there is to a sprite's animation.
+        """
+        return self._animation_state
+
+    @animation_state.setter
+    def animation_state(self, animation_state):
+        if animation_state != self._animation_state:
+            self._animation_state = animation_state
+            self.animation_start = TIMELINE.tick + 1
+            # Look the animation up now rather than on every tick.
+            self._animation = (
+                self.frames[animation_state] if self.frames is not None else None
+            )
+
     def animate(self):
-        if self.frames is not None:
-            roll = self.frames[self.animation_state]
-            if roll is not None:
-                try:
-                    next_frame_index = next(roll)
-                    if next_frame_index != self.index:
-                        self.set_sprite_index(next_frame_index)
-                except StopIteration:
-                    if AnimationState.state_kills_sprite(self.animation_state):
-                        self.kill()
-                    self.animation_state = AnimationState.stopped
+        animation = self._animation
+        if animation is not None:
+            next_frame_index = animation.get_frame(TIMELINE.tick - self.animation_start)
+            if next_frame_index is None:
+                if AnimationState.state_kills_sprite(self.animation_state):
+                    self.kill()
+                self.animation_state = AnimationState.stopped
+            elif next_frame_index != self.index:
+                self.set_sprite_index(next_frame_index)
 
     def play(self):
         """
-        Plays a sound if there is a sound generator attached; the
-        mixer is initialized; and a channel is assigned.
+        Plays a sound if there is a sound generator attached and a
+        channel is assigned. There are no channels without a mixer.
         """
-        if self.sounds is not None and pg.mixer and self.channel is not None:
+        if self.sounds is not None and self.channel is not None:
             effect_name = next(self.sounds)
             if effect_name is not None:
-                effect = SOUNDS[effect_name]
+                effect = SOUND_EFFECTS[effect_name]
                 # Do not attempt to play if the channel is busy.
                 if not self.channel.get_busy():
                     self.channel.play(effect, fade_ms=10)
@@ -274,12 +379,15 @@ class Sprite(pg.sprite.Sprite):
     def set_sprite_index(self, index):
         """
         Sets the sprite to `index` and updates the image accordingly.
+
+        The frames are shared, so this only swaps references: the
+        rotated image, mask and rect size come from `CACHE`.
         """
-        self.image = self.image_tiles[(self.flipped_x, self.flipped_y, index)]
-        self.surface = self.image.copy()
-        self.rect = self.image.get_rect(center=self.rect.center)
-        self.mask = pg.mask.from_surface(self.image)
+        self.surface = self.image_tiles[(self.flipped_x, self.flipped_y, index)]
         self.index = index
+        # The new frame has to be rotated even if the orientation has
+        # not changed since the last frame.
+        self._last_angle = None
         self.rotate(self.orientation)
 
 
@@ -325,45 +433,68 @@ class Enemy(DirectedSprite):
     """
     Subclass of `DirectedSprite` that additionally adds subtle
     rotation to the Enemy to mimic human gait.
+
+    Instead of a `path` generator, an enemy can walk a precomputed
+    `trajectory` shared with other enemies. It then only tracks its
+    own `step` along the trajectory, and the `jitter` offset it adds
+    to every position.
     """
 
     _layer = Layer.enemy
 
-    def __init__(self, health: int = 100, **kwargs):
+    def __init__(self, health: int = 100, trajectory=None, jitter=(0, 0), **kwargs):
         # Tracks the offset, if any, if the image is flipped
         self.sprite_offset = Vector(0, 0)
         self.health = health
+        self.trajectory = trajectory
+        self.jitter = jitter
+        self.step = 0
         super().__init__(**kwargs)
 
+    def next_position(self):
+        """
+        Returns the next position, and whether the sprite must be
+        flipped there, from the trajectory or the path. Raises
+        `StopIteration` when the end is reached.
+        """
+        if self.trajectory is None:
+            position, _, flipx = next(self.path)
+            return position, flipx
+        step = self.step
+        if step >= len(self.trajectory):
+            raise StopIteration
+        self.step = step + 1
+        positions = self.trajectory.positions
+        jx, jy = self.jitter
+        return (
+            (positions.item(step, 0) + jx, positions.item(step, 1) + jy),
+            self.trajectory.flips.item(step),
+        )
+
     def update(self):
         try:
             self.animate()
-            if self.path is not None:
+            if self.path is not None or self.trajectory is not None:
                 # If we're dying we stop moving.
                 if self.animation_state == AnimationState.dying:
                     return
                 self.state = SpriteState.moving
-                position, _, flipx = next(self.path)
+                position, flipx = self.next_position()
                 # The state of flipx has changed since we were last
                 # invoked; that happens whenever our orientation is
                 # supposed to change.
                 if flipx != self.flipped_x:
                     # Acknowledge flipx is changed and update the internal state.
                     self.flipped_x = flipx
-                    # Calculate the centroid of our CURRENT mask,
-                    # before we ask `set_sprite_index` to flip our
-                    # image.
-                    centroid = self.mask.centroid()
+                    # Look up how far the centroid of our current
+                    # frame moves when it is flipped. That is the
+                    # offset we must apply to our movement to ensure
+                    # the flipped image is placed in the exact same
+                    # position as before
+                    self.sprite_offset = FLIP_OFFSETS[(flipx, self.index)]
                     # Change to our current index (but actually flip
                     # it because we set flipped_x before)
                     self.set_sprite_index(self.index)
-                    # Now get the _new_ centroid
-                    new_centroid = self.mask.centroid()
-                    # The delta between both centroids is the offset
-                    # we must apply to our movement to ensure the
-                    # flipped image is placed in the exact same
-                    # position as before
-                    self.sprite_offset = Vector(new_centroid) - Vector(centroid)
                 if flipx:
                     self.move(position - self.sprite_offset)
                 else:
@@ -422,6 +553,42 @@ class Decal(Background):
     _layer = Layer.decal
 
 
+class StaticLayer(pg.sprite.Sprite):
+    """
+    Flattens static `sprites`, all drawn in `layer`, into a single
+    image so they no longer have to be updated and drawn one by one
+    every frame.
+    """
+
+    def __init__(self, groups, layer, sprites):
+        self._layer = layer
+        surface = create_surface()
+        surface.fill((0, 0, 0, 0))
+        # Blending two translucent images onto a transparent surface
+        # is not the same as blending them, one after the other, onto
+        # the screen. It is if we blend them premultiplied by their
+        # alpha, and then divide the alpha back out.
+        for sprite in sprites:
+            surface.blit(
+                sprite.image.premul_alpha(),
+                sprite.rect,
+                special_flags=pg.BLEND_PREMULTIPLIED,
+            )
+        rgb = pg.surfarray.pixels3d(surface)
+        alpha = pg.surfarray.pixels_alpha(surface)
+        visible = alpha > 0
+        rgb[visible] = np.minimum(
+            rgb[visible].astype(np.uint16) * 255 // alpha[visible, None], 255
+        )
+        # Unlock the surface again.
+        del rgb, alpha
+        # Crop the image to the sprites so we don't blit a screen's
+        # worth of transparent pixels every frame.
+        self.rect = surface.get_bounding_rect()
+        self.image = surface.subsurface(self.rect)
+        super().__init__(groups)
+
+
 class Projectile(DirectedSprite):
     """
     Background subclass that changes the layer to `Layer.projectile`
@@ -447,7 +614,7 @@ class Text(DirectedSprite):
     def __init__(self, text, color, size, action=None, path=None, **kwargs):
         self.color = color
         self.size = size
-        self.font = pg.font.Font(FONT_NAME, size)
+        self.font = FONTS[(FONT_NAME, size)]
         self.action = action
         self.rect = pg.Rect(0, 0, 0, 0)
         self.set_text(text)
@@ -470,39 +637,77 @@ class Text(DirectedSprite):
         self.render_text()
 
     def render_text(self):
-        self.image = self.font.render(self.text, True, self.color)
+        self.image = TEXT_CACHE.render(FONT_NAME, self.size, self.text, self.color)
         self.surface = self.image
         self.rect = self.image.get_rect(center=self.rect.center)
 
 
 class HUDText(Text):
     """
-    Subclass of `Text` that stores a game `mode` and updates the
-    rendered text every frame with vital game stats. However, due to
-    how the `Text` sprite re-renders, we need to additionally store
-    the old texto ensure we only force re-renders when the text
-    actually has changed.
+    Subclass of `Text` that stores a game `mode` and shows its vital
+    game stats.
+
+    The HUD is made of `fields`: a static label followed by one of
+    the mode's numbers. The labels and numbers are rendered, through
+    `TEXT_CACHE`, on their own, so a change only renders the number
+    that changed. The pieces are then composited onto a new image, and
+    only when a number changes, so the HUD is only redrawn when it
+    has to be.
     """
 
     _layer = Layer.hud
 
+    # Pairs of a label and the name of the `mode` attribute shown
+    # after it.
+    fields = (
+        ("Killed: ", "killed"),
+        (" Escaped: ", "escaped"),
+        (" Intensity: ", "intensity"),
+        (" Max turrets: ", "max_defenses"),
+    )
+
     def __init__(self, mode, **kwargs):
-        super().__init__(**kwargs)
         self.mode = mode
-        self._old_text = None
+        self._values = None
+        super().__init__(**kwargs)
+
+    def get_values(self):
+        return tuple(getattr(self.mode, name) for _, name in self.fields)
 
     def update(self):
-        text = f"Killed: {self.mode.killed} Escaped: {self.mode.escaped} Intensity: {self.mode.intensity} Max turrets: {self.mode.max_defenses}"
-        if text != self._old_text:
-            self.set_text(text)
-        self._old_text = text
+        if self.get_values() != self._values:
+            self.render_text()
         super().update()
 
+    def render_text(self):
+        self._values = self.get_values()
+        pieces = []
+        for (label, _), value in zip(self.fields, self._values):
+            for text in (label, str(value)):
+                pieces.append(TEXT_CACHE.render(FONT_NAME, self.size, text, self.color))
+        image = create_surface(
+            size=(
+                sum(piece.get_width() for piece in pieces),
+                max(piece.get_height() for piece in pieces),
+            )
+        )
+        image.fill((0, 0, 0, 0))
+        x = 0
+        for piece in pieces:
+            image.blit(piece, (x, 0))
+            x += piece.get_width()
+        self.text = "".join(
+            f"{label}{value}" for (label, _), value in zip(self.fields, self._values)
+        )
+        self.image = image
+        self.surface = self.image
+        self.rect = self.image.get_rect(center=self.rect.center)
+
 
-def create_animation_roll(frames: Dict[AnimationState, Generator[int, None, None]]):
+def create_animation_roll(frames: Dict[AnimationState, Animation]):
     """
-    Takes a dictionary of animation states (as keys) and frame
-    generators (as values) and fills out the missing ones with `None`.
+    Takes a dictionary of animation states (as keys) and animations
+    (as values) and fills out the missing ones with `None`.
     """
     for state in AnimationState:
         if state not in frames:
@@ -510,6 +715,31 @@ def create_animation_roll(frames: Dict[AnimationState, Generator[int, None, None
     return frames
 
 
+ENEMY_ANIMATIONS = create_animation_roll(
+    {
+        AnimationState.walking: Animation(
+            frames=tuple(ANIMATIONS["enemy_walk"]), hold=2, loop=True
+        ),
+        AnimationState.dying: Animation(
+            frames=(
+                *ANIMATIONS["enemy_die"],
+                # Repeat the last frame for a little while before the
+                # sprite is killed.
+                *repeat(ANIMATIONS["enemy_die"][-1], 20),
+            ),
+        ),
+    },
+)
+
+PROJECTILE_ANIMATIONS = create_animation_roll(
+    {
+        AnimationState.exploding: Animation(
+            frames=tuple(ANIMATIONS["projectile_explode"]), hold=2
+        ),
+    },
+)
+
+
 def create_turret_sweep(orientation, sweep_degrees, speed=3):
     """
     Creates a turret sweep generator that points in `orientation`
@@ -527,6 +757,48 @@ def create_turret_sweep(orientation, sweep_degrees, speed=3):
     )
 
 
+@dataclass
+class VisionFrame:
+    """
+    A vision `image` rotated to one angle of a turret's sweep, with
+    its collision `mask` and the `offset` of its center from the
+    center of the turret.
+    """
+
+    image: pg.Surface
+    mask: pg.mask.Mask
+    offset: Vector
+
+    @classmethod
+    def create(cls, surface, angle):
+        """
+        Rotates the vision `surface` so it points, length-wise, away
+        from its turret at `angle` degrees.
+        """
+        # rotate the rectangle shape so it points, length-wise,
+        # away. If you reverse the width/height you may need to alter
+        # this angle!
+        new_angle = angle + 90
+        image = pg.transform.rotozoom(surface, new_angle, 1)
+        # Determine where to put the rectangle relative to the turret
+        v = Vector(0, surface.get_rect().height // 2)
+        # Recall that rotating a vector and applying a rotation using
+        # the transform library is different! The transform library
+        # "understands" the coordinate system used by computers;
+        # namely, that origin (0,0) is in the top-left corner of the
+        # screen as opposed to the bottom-right used in cartesian
+        # coordinate systems.
+        #
+        # Vectors, on the other hand, use regular geometry and as such
+        # we must negate the angle to ensure the rotation is correct
+        # when we add that vector to the computer's coordinate system.
+        return cls(
+            image=image,
+            mask=pg.mask.from_surface(image),
+            offset=v.rotate(-new_angle),
+        )
+
+
 class Vision(Sprite):
     """
     Vision sprite that represents what a turret can see.
@@ -556,33 +828,25 @@ class Vision(Sprite):
     def generate_rotation(self):
         return create_turret_sweep(self.orientation, sweep_degrees=60)
 
+    def rotate_cache_key(self):
+        """
+        Returns a tuple of fields used as a cache key to speed up rotations
+        """
+        # Every vision is drawn the same way by `create_vision`, so
+        # visions of the same size look the same.
+        return self.surface.get_size()
+
     def rotate(self, angle):
-        # rotate the rectangle shape so it points, length-wise,
-        # away. If you reverse the width/height you may need to alter
-        # this angle!
-        new_angle = angle + 90
-        new_image = pg.transform.rotozoom(self.surface, new_angle, 1)
-        turret = self.turret
-        # Determine where to put the rectangle relative to the turret
-        v = Vector(
-            0,
-            (self.surface.get_rect().height // 2 + turret.surface.get_rect().top),
-        )
-        # Recall that rotating a vector and applying a rotation using
-        # the transform library is different! The transform library
-        # "understands" the coordinate system used by computers;
-        # namely, that origin (0,0) is in the top-left corner of the
-        # screen as opposed to the bottom-right used in cartesian
-        # coordinate systems.
-        #
-        # Vectors, on the other hand, use regular geometry and as such
-        # we must negate the angle to ensure the rotation is correct
-        # when we add that vector to the computer's coordinate system.
-        rv = v.rotate(-new_angle)
-        new_rect = new_image.get_rect(center=turret.rect.center + rv)
-        self.image = new_image
-        self.rect = new_rect
-        self.mask = pg.mask.from_surface(self.image)
+        # Every turret sweeps through the same handful of angles, so
+        # the rotated visions are shared between all of them.
+        k = (self.rotate_cache_key(), angle)
+        try:
+            frame = VISION_SWEEPS[k]
+        except KeyError:
+            frame = VISION_SWEEPS[k] = VisionFrame.create(self.surface, angle)
+        self.image = frame.image
+        self.rect = frame.image.get_rect(center=self.turret.rect.center + frame.offset)
+        self.mask = frame.mask
 
 
 @dataclass
@@ -763,27 +1027,20 @@ class SpriteManager:
         )
         return shrub
 
-    def create_enemy(self, position, path):
+    def create_enemy(self, position, path=None, trajectory=None, jitter=(0, 0)):
         """
-        Factory that creates a enemy sprite at a given `position` with a `path`.
+        Factory that creates a enemy sprite at a given `position`
+        with either a `path` or a shared `trajectory` offset by `jitter`.
         """
         enemy = Enemy.create_from_sprite(
             index="enemy_1_walk_001",
             sounds=cycle(chain([SOUND_FOOTSTEPS], repeat(None, 120))),
             channel=self.channels["footsteps"],
             animation_state=AnimationState.walking,
-            frames=create_animation_roll(
-                {
-                    AnimationState.walking: cycle(extend(ANIMATIONS["enemy_walk"], 2)),
-                    AnimationState.dying: chain(
-                        iter(ANIMATIONS["enemy_die"]),
-                        # Repeat the last frame for a little while
-                        # before the sprite is killed.
-                        repeat(ANIMATIONS["enemy_die"][-1], 20),
-                    ),
-                },
-            ),
+            frames=ENEMY_ANIMATIONS,
             path=path,
+            trajectory=trajectory,
+            jitter=jitter,
             groups=[self.layers],
             state=SpriteState.moving,
         )
@@ -823,13 +1080,7 @@ class SpriteManager:
             groups=[self.layers],
             orientation=0,
             index="projectile",
-            frames=create_animation_roll(
-                {
-                    AnimationState.exploding: extend(
-                        ANIMATIONS["projectile_explode"], 2
-                    ),
-                },
-            ),
+            frames=PROJECTILE_ANIMATIONS,
             path=path,
             sounds=None,
         )